@@ -1,31 +1,351 @@
-import hashlib
-
-'''  -- Hashing Example --
-name = 'Sanaullah'
-hash_object = hashlib.sha256(name.encode())
-hex_dig = hash_object.hexdigest()
-print(f'SHA-256 hash of "{name}" is: {hex_dig}')
-'''
-
-def hash_file(file_path):
-  h = hashlib.new('sha256')
-  with open(file_path,'rb') as file:
-    while True:
-      chunk = file.read(1024)
-      if not chunk:
-        break
-      h.update(chunk)
-  return h.hexdigest()
-
-def verify_integrity(file1, file2):
-  hash1 = hash_file(file1)
-  hash2 = hash_file(file2)
-  print(f"\nChecking the integrity between '{file1}' and '{file2}':")
-  if hash1 == hash2:
-    return "File is intact. No changes detected."
-  return "File has been altered or corrupted."
-
-if __name__ == "__main__":
-  file_path = 'crypto/sample_files/sample_text.txt'
-  print(f'SHA-256 hash of file "{file_path}" is:\n{hash_file(file_path)}')
-  print(verify_integrity(r'crypto/sample_files/sample_text.txt', r'crypto/sample_files/sample2.txt'))
\ No newline at end of file
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+'''  -- Hashing Example --
+name = 'Sanaullah'
+hash_object = hashlib.sha256(name.encode())
+hex_dig = hash_object.hexdigest()
+print(f'SHA-256 hash of "{name}" is: {hex_dig}')
+'''
+
+ALGORITHMS = ('sha256', 'blake2b', 'sha512')
+CHUNK_SIZE = 1024 * 1024
+MERKLE_BLOCK = 4 * 1024 * 1024
+LEAF_PREFIX = b'\x00'
+
+def hash_file(file_path, algorithm='sha256', offset=0, length=None, prefix=b''):
+  # One reusable 1 MiB buffer: a few Python calls per MB, and hashlib drops
+  # the GIL while it digests each chunk
+  h = hashlib.new(algorithm, prefix)
+  buf = bytearray(CHUNK_SIZE)
+  view = memoryview(buf)
+  remaining = length
+  with open(file_path, 'rb', buffering=0) as file:
+    if offset:
+      file.seek(offset)
+    while remaining is None or remaining > 0:
+      n = file.readinto(view if remaining is None or remaining >= CHUNK_SIZE else view[:remaining])
+      if not n:
+        break
+      h.update(view[:n])
+      if remaining is not None:
+        remaining -= n
+  return h.hexdigest()
+
+def compare_files(file1, file2, chunk_size=CHUNK_SIZE):
+  """Return None when the files are identical, else the offset of the first chunk that differs.
+
+  Sizes are checked first, then both files are read in lockstep, so a
+  mismatch stops the comparison without reading the rest of either file.
+  """
+  size1, size2 = os.path.getsize(file1), os.path.getsize(file2)
+  buf1, buf2 = bytearray(chunk_size), bytearray(chunk_size)
+  view1, view2 = memoryview(buf1), memoryview(buf2)
+  offset = 0
+  with open(file1, 'rb', buffering=0) as f1, open(file2, 'rb', buffering=0) as f2:
+    if size1 != size2:
+      return min(size1, size2)
+    while True:
+      n1, n2 = f1.readinto(buf1), f2.readinto(buf2)
+      if n1 != n2 or view1[:n1] != view2[:n2]:
+        return offset
+      if not n1:
+        return None
+      offset += n1
+
+def iter_files(paths):
+  """Yield every regular file under paths, walking directories in sorted order."""
+  for path in paths:
+    if not os.path.isdir(path):
+      yield path
+      continue
+    for root, dirs, files in os.walk(path):
+      dirs.sort()
+      for name in sorted(files):
+        full = os.path.join(root, name)
+        if os.path.isfile(full):
+          yield full
+
+def hash_files(paths, algorithm='sha256', workers=None):
+  """Hash many files at once on a thread pool; returns [(path, size, digest), ...]."""
+  files = list(iter_files(paths))
+  with ThreadPoolExecutor(max_workers=workers or min(32, (os.cpu_count() or 1) + 4)) as pool:
+    digests = pool.map(lambda p: hash_file(p, algorithm), files)
+    return [(path, os.path.getsize(path), digest) for path, digest in zip(files, digests)]
+
+MANIFEST_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+  path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, inode INTEGER, algorithm TEXT, digest TEXT
+);
+"""
+
+class Manifest:
+  """Digests of every file under root, cached in SQLite by (size, mtime, inode).
+
+  A sweep stats each file and only rehashes the ones whose size, mtime or
+  inode moved since the last sweep, so checking an unchanged tree costs a
+  stat per file. Paths are stored relative to root, which lets manifests of
+  two copies of a tree be diffed.
+  """
+
+  def __init__(self, db_path, root='.'):
+    self.root = root
+    self.db = sqlite3.connect(db_path, check_same_thread=False)
+    self._lock = threading.Lock()
+    self.db.execute('PRAGMA journal_mode=WAL')
+    self.db.executescript(MANIFEST_SCHEMA)
+
+  def _key(self, path):
+    return os.path.relpath(path, self.root)
+
+  def _cached(self, key, st, algorithm):
+    with self._lock:
+      row = self.db.execute('SELECT size, mtime_ns, inode, algorithm, digest FROM files WHERE path = ?',
+                            (key,)).fetchone()
+    if row and row[:4] == (st.st_size, st.st_mtime_ns, st.st_ino, algorithm):
+      return row[4]
+    return None
+
+  def _record(self, rows, started_ns):
+    # A file written in the same clock tick as the sweep could change again
+    # without moving its mtime; leave its mtime unset so the next sweep rehashes it
+    with self._lock, self.db:
+      self.db.executemany('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)', [
+        (key, st.st_size, st.st_mtime_ns if st.st_mtime_ns < started_ns - 2_000_000_000 else None,
+         st.st_ino, algorithm, digest) for key, st, algorithm, digest in rows])
+
+  def sweep(self, algorithm='sha256', workers=None):
+    """Bring the manifest up to date with root; returns (files, files rehashed, bytes rehashed)."""
+    started_ns = time.time_ns()
+    seen, stale = [], []
+    for path in iter_files([self.root]):
+      key, st = self._key(path), os.stat(path)
+      seen.append(key)
+      if self._cached(key, st, algorithm) is None:
+        stale.append((path, key, st))
+    with ThreadPoolExecutor(max_workers=workers or min(32, (os.cpu_count() or 1) + 4)) as pool:
+      digests = pool.map(lambda item: hash_file(item[0], algorithm), stale)
+      rows = [(key, st, algorithm, digest) for (_, key, st), digest in zip(stale, digests)]
+    self._record(rows, started_ns)
+    with self._lock, self.db:
+      self.db.execute('CREATE TEMP TABLE IF NOT EXISTS seen (path TEXT PRIMARY KEY)')
+      self.db.execute('DELETE FROM seen')
+      self.db.executemany('INSERT INTO seen VALUES (?)', ((k,) for k in seen))
+      self.db.execute('DELETE FROM files WHERE path NOT IN (SELECT path FROM seen)')
+    return len(seen), len(stale), sum(st.st_size for _, _, st in stale)
+
+  def digest(self, path, algorithm='sha256'):
+    """Digest of one file, from the manifest when it hasn't changed since it was recorded."""
+    started_ns = time.time_ns()
+    key, st = self._key(path), os.stat(path)
+    digest = self._cached(key, st, algorithm)
+    if digest is None:
+      digest = hash_file(path, algorithm)
+      self._record([(key, st, algorithm, digest)], started_ns)
+    return digest
+
+  def close(self):
+    self.db.close()
+
+def diff_manifests(old_path, new_path):
+  """Compare two manifest files; returns {'added': [...], 'removed': [...], 'changed': [...]}."""
+  db = sqlite3.connect(old_path)
+  db.execute('ATTACH DATABASE ? AS new', (new_path,))
+  diff = {
+    'added': db.execute('SELECT path FROM new.files WHERE path NOT IN (SELECT path FROM main.files) '
+                        'ORDER BY path').fetchall(),
+    'removed': db.execute('SELECT path FROM main.files WHERE path NOT IN (SELECT path FROM new.files) '
+                          'ORDER BY path').fetchall(),
+    'changed': db.execute('SELECT a.path FROM main.files a JOIN new.files b USING (path) '
+                          'WHERE a.digest != b.digest OR a.algorithm != b.algorithm ORDER BY a.path').fetchall(),
+  }
+  db.close()
+  return {kind: [path for (path,) in rows] for kind, rows in diff.items()}
+
+class MerkleTree:
+  """Hash tree over fixed-size blocks of a file.
+
+  Leaves are hash_file digests of each block_size range, computed on a
+  thread pool; each parent hashes its two children. Leaves hash 0x00 plus
+  the block and inner nodes 0x01 plus the children, so a block can never
+  pass for an inner node. Comparing two trees walks down from the root
+  only where digests differ, which pins a change to the byte ranges of
+  the blocks that moved.
+  """
+
+  def __init__(self, leaves, size, algorithm='sha256', block_size=MERKLE_BLOCK):
+    self.levels = [leaves]
+    self.size = size
+    self.algorithm = algorithm
+    self.block_size = block_size
+    while len(self.levels[-1]) > 1:
+      below = self.levels[-1]
+      self.levels.append([hashlib.new(algorithm, b'\x01' + bytes.fromhex(below[i]) +
+                                      bytes.fromhex(below[i + 1] if i + 1 < len(below) else '')).hexdigest()
+                          for i in range(0, len(below), 2)])
+
+  @classmethod
+  def build(cls, file_path, algorithm='sha256', block_size=MERKLE_BLOCK, workers=None):
+    size = os.path.getsize(file_path)
+    offsets = range(0, max(size, 1), block_size)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+      leaves = list(pool.map(lambda o: hash_file(file_path, algorithm, o, block_size, LEAF_PREFIX), offsets))
+    return cls(leaves, size, algorithm, block_size)
+
+  @property
+  def root(self):
+    return self.levels[-1][0]
+
+  def block_range(self, i):
+    start = i * self.block_size
+    return start, min(start + self.block_size, self.size)
+
+  def changed_blocks(self, other):
+    """Indexes of the blocks whose contents differ between this tree and other."""
+    if (self.algorithm, self.block_size) != (other.algorithm, other.block_size):
+      raise ValueError('trees were built with different algorithms or block sizes')
+    if len(self.levels) != len(other.levels):
+      # Different shapes: the file grew or shrank, so fall back to the leaves
+      mine, theirs = self.levels[0], other.levels[0]
+      return [i for i in range(max(len(mine), len(theirs)))
+              if i >= len(mine) or i >= len(theirs) or mine[i] != theirs[i]]
+    changed, pending = [], [(len(self.levels) - 1, 0)]
+    while pending:
+      depth, i = pending.pop()
+      mine, theirs = self.levels[depth], other.levels[depth]
+      if i < len(mine) and i < len(theirs) and mine[i] == theirs[i]:
+        continue
+      if depth == 0:
+        changed.append(i)
+      else:
+        pending.extend((depth - 1, c) for c in (2 * i + 1, 2 * i) if c < max(len(self.levels[depth - 1]),
+                                                                            len(other.levels[depth - 1])))
+    return sorted(changed)
+
+  def changed_ranges(self, other):
+    """Byte ranges (start, end) that differ from other, with adjacent blocks merged."""
+    ranges = []
+    for i in self.changed_blocks(other):
+      start, end = i * self.block_size, min((i + 1) * self.block_size, max(self.size, other.size))
+      if ranges and ranges[-1][1] == start:
+        ranges[-1] = (ranges[-1][0], end)
+      else:
+        ranges.append((start, end))
+    return ranges
+
+  def verify(self, file_path, blocks=None, workers=None):
+    """Rehash blocks of file_path in parallel; returns the byte ranges that no longer match."""
+    blocks = range(len(self.levels[0])) if blocks is None else blocks
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+      digests = pool.map(lambda i: hash_file(file_path, self.algorithm, i * self.block_size, self.block_size,
+                                             LEAF_PREFIX), blocks)
+      return [self.block_range(i) for i, digest in zip(blocks, digests) if digest != self.levels[0][i]]
+
+  def save(self, path):
+    with open(path, 'w') as file:
+      json.dump({'algorithm': self.algorithm, 'block_size': self.block_size,
+                 'size': self.size, 'leaves': self.levels[0]}, file)
+
+  @classmethod
+  def load(cls, path):
+    with open(path) as file:
+      data = json.load(file)
+    return cls(data['leaves'], data['size'], data['algorithm'], data['block_size'])
+
+def verify_integrity(file1, file2, manifest=None):
+  if manifest:
+    with ThreadPoolExecutor(max_workers=2) as pool:
+      hash1, hash2 = pool.map(manifest.digest, (file1, file2))
+    same = hash1 == hash2
+  else:
+    same = compare_files(file1, file2) is None
+  print(f"\nChecking the integrity between '{file1}' and '{file2}':")
+  if same:
+    return "File is intact. No changes detected."
+  return "File has been altered or corrupted."
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description='Hash files and check their integrity.')
+  commands = parser.add_subparsers(dest='command', required=True)
+  cmd = commands.add_parser('hash', help='hash files and directory trees')
+  cmd.add_argument('paths', nargs='+')
+  cmd.add_argument('-a', '--algorithm', choices=ALGORITHMS, default='sha256')
+  cmd.add_argument('-j', '--workers', type=int, default=None, help='files hashed at once')
+  cmd = commands.add_parser('verify', help='check two files have the same contents')
+  cmd.add_argument('file1')
+  cmd.add_argument('file2')
+  cmd.add_argument('--manifest', help='manifest database to reuse digests from')
+  cmd.add_argument('--root', default='.', help='root the manifest was recorded against')
+  cmd.add_argument('--hash', action='store_true', help='compare digests instead of the bytes')
+  cmd = commands.add_parser('tree', help='build a Merkle tree of a file, or find the ranges that changed')
+  cmd.add_argument('file')
+  cmd.add_argument('--save', help='write the tree to this JSON file')
+  cmd.add_argument('--check', help='tree JSON to compare the file against')
+  cmd.add_argument('-a', '--algorithm', choices=ALGORITHMS, default='sha256')
+  cmd.add_argument('-b', '--block-size', type=int, default=MERKLE_BLOCK)
+  cmd.add_argument('-j', '--workers', type=int, default=None)
+  cmd = commands.add_parser('manifest', help='record or refresh the digests of a tree')
+  cmd.add_argument('db')
+  cmd.add_argument('root')
+  cmd.add_argument('-a', '--algorithm', choices=ALGORITHMS, default='sha256')
+  cmd.add_argument('-j', '--workers', type=int, default=None)
+  cmd = commands.add_parser('diff', help='list files added, removed or changed between two manifests')
+  cmd.add_argument('old')
+  cmd.add_argument('new')
+  args = parser.parse_args(argv)
+
+  if args.command == 'hash':
+    start = time.perf_counter()
+    results = hash_files(args.paths, args.algorithm, args.workers)
+    elapsed = time.perf_counter() - start
+    for path, _, digest in results:
+      print(f'{digest}  {path}')
+    total = sum(size for _, size, _ in results) / 1e6
+    print(f'{len(results)} files, {total:,.1f} MB in {elapsed:.2f}s ({total / max(elapsed, 1e-9):,.0f} MB/s)',
+          file=sys.stderr)
+  elif args.command == 'verify':
+    manifest = Manifest(args.manifest, args.root) if args.manifest else None
+    if args.hash and not manifest:
+      with ThreadPoolExecutor(max_workers=2) as pool:
+        hash1, hash2 = pool.map(hash_file, (args.file1, args.file2))
+      print("File is intact. No changes detected." if hash1 == hash2 else "File has been altered or corrupted.")
+    else:
+      print(verify_integrity(args.file1, args.file2, manifest))
+  elif args.command == 'tree':
+    start = time.perf_counter()
+    if args.check:
+      saved = MerkleTree.load(args.check)
+      tree = MerkleTree.build(args.file, saved.algorithm, saved.block_size, args.workers)
+      ranges = tree.changed_ranges(saved)
+      for begin, end in ranges:
+        print(f'changed {begin}-{end}')
+      print('unchanged' if not ranges else f'{len(ranges)} changed ranges')
+    else:
+      tree = MerkleTree.build(args.file, args.algorithm, args.block_size, args.workers)
+      print(f'{tree.root}  {args.file}')
+    if args.save:
+      tree.save(args.save)
+    elapsed = time.perf_counter() - start
+    print(f'{tree.size / 1e6:,.1f} MB in {elapsed:.2f}s ({tree.size / 1e6 / max(elapsed, 1e-9):,.0f} MB/s)',
+          file=sys.stderr)
+  elif args.command == 'manifest':
+    start = time.perf_counter()
+    manifest = Manifest(args.db, args.root)
+    files, hashed, size = manifest.sweep(args.algorithm, args.workers)
+    manifest.close()
+    print(f'{files} files, {hashed} rehashed ({size / 1e6:,.1f} MB) in {time.perf_counter() - start:.2f}s')
+  elif args.command == 'diff':
+    diff = diff_manifests(args.old, args.new)
+    for kind, mark in (('added', '+'), ('removed', '-'), ('changed', 'M')):
+      for path in diff[kind]:
+        print(f'{mark} {path}')
+
+if __name__ == "__main__":
+  main()
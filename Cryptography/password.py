@@ -1,41 +1,381 @@
-from zxcvbn import zxcvbn
-from getpass import getpass
-import bcrypt
-
-def password_strength(password):
-  result = zxcvbn(password)
-  score = result['score']  # 'Score' - (0 to 4)
-
-  if score==3:
-    response = "Strong enough passsword: score of 3"
-  elif score == 4:
-    response = "Very strong password: score of 4"
-  else:
-    feedback = result.get('feedback')
-    warning = feedback.get('warning')
-    suggestions = feedback.get('suggestions')
-    response = f"Weak password: score of {score}\nWarning: {warning}\nSuggestions: {suggestions[0]}"
-  return response
-
-def hash_password(password):
-  salt = bcrypt.gensalt()
-  hashed = bcrypt.hashpw(password.encode(), salt)
-  return hashed
-
-def verify_password(password_attempt, hashed):
-  if bcrypt.checkpw(password_attempt.encode(), hashed):
-    return "Password is correct. Access granted!"
-  return "Incorrect password. Access denied!"
-
-if __name__ == "__main__":
-  while True:
-    password1 = getpass("Enter a password to check strength: ")
-    print(password_strength(password1))
-    if password_strength(password1).startswith("Weak"):
-      print("Choose a stronger password.")
-    else:
-      break
-  hashed_password = hash_password(password1)
-  print("Hashed password: ", hashed_password)
-  attempt = getpass("Re-enter the password to verify: ")
-  print(verify_password(attempt, hashed_password))
\ No newline at end of file
+from zxcvbn import zxcvbn
+from getpass import getpass
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+import argparse
+import asyncio
+import hashlib
+import heapq
+import mmap
+import os
+import tempfile
+import threading
+import time
+import bcrypt
+
+SCORE_CACHE_SIZE = 100_000
+BREACHED = {'score': 0, 'feedback': {'warning': 'This password has appeared in a data breach.',
+                                     'suggestions': ['Choose a password that has never been used elsewhere.']}}
+
+_score_cache = OrderedDict()
+_score_lock = threading.Lock()
+
+def _cache_key(password):
+  # Keyed by a digest so the cache never keeps the passwords themselves
+  return hashlib.sha256(password.encode()).digest()
+
+def _cache_get(key):
+  with _score_lock:
+    result = _score_cache.get(key)
+    if result is not None:
+      _score_cache.move_to_end(key)
+    return result
+
+def _cache_put(key, result):
+  with _score_lock:
+    _score_cache[key] = result
+    if len(_score_cache) > SCORE_CACHE_SIZE:
+      _score_cache.popitem(last=False)
+
+def _zxcvbn_score(password):
+  result = zxcvbn(password)
+  return {'score': result['score'], 'feedback': result['feedback']}
+
+class BreachList:
+  """Known-compromised passwords as a sorted file of raw SHA-1 digests.
+
+  The file is memory-mapped and searched by bisection, so a lookup touches
+  about log2(n) records and lists of hundreds of millions of entries cost
+  no resident memory beyond the pages they hit.
+  """
+
+  RECORD = 20
+
+  def __init__(self, path):
+    with open(path, 'rb') as file:
+      self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    self._count = len(self._map) // self.RECORD
+
+  def __len__(self):
+    return self._count
+
+  def __contains__(self, password):
+    key = hashlib.sha1(password.encode()).digest()
+    lo, hi = 0, self._count
+    while lo < hi:
+      mid = (lo + hi) // 2
+      if self._map[mid * self.RECORD:(mid + 1) * self.RECORD] < key:
+        lo = mid + 1
+      else:
+        hi = mid
+    return lo < self._count and self._map[lo * self.RECORD:(lo + 1) * self.RECORD] == key
+
+  def close(self):
+    self._map.close()
+
+BREACH_FORMATS = ('plain', 'sha1')
+MERGE_FAN_IN = 256
+
+def _breach_digests(source, fmt):
+  with open(source, encoding='utf-8', errors='replace') as file:
+    for number, line in enumerate(file, 1):
+      line = line.rstrip('\r\n')
+      if not line:
+        continue
+      if fmt == 'plain':
+        yield hashlib.sha1(line.encode()).digest()
+        continue
+      head = line.split(':', 1)[0]
+      try:
+        digest = bytes.fromhex(head)
+      except ValueError:
+        digest = b''
+      if len(digest) != BreachList.RECORD:
+        raise ValueError(f"{source}:{number}: expected a SHA-1 hex digest")
+      yield digest
+
+def _read_run(path):
+  with open(path, 'rb') as file:
+    while True:
+      block = file.read(BreachList.RECORD * 4096)
+      if not block:
+        return
+      for i in range(0, len(block), BreachList.RECORD):
+        yield block[i:i + BreachList.RECORD]
+
+def build_breach_list(source, path, fmt='plain', run_size=1_000_000):
+  """Write a BreachList file from a text file of passwords, or of HIBP 'SHA1HEX[:count]' lines with fmt='sha1'.
+
+  Digests are sorted in runs of run_size that are spilled to temporary
+  files next to path and then merged, so memory stays bounded however
+  large the source is. HIBP downloads are already sorted, which makes each
+  run's sort a single linear pass.
+  """
+  if fmt not in BREACH_FORMATS:
+    raise ValueError(f"unknown breach list format {fmt!r}")
+  directory = os.path.dirname(os.path.abspath(path))
+  with tempfile.TemporaryDirectory(dir=directory) as tmp:
+    runs = []
+    digests = _breach_digests(source, fmt)
+    while True:
+      run = [d for _, d in zip(range(run_size), digests)]
+      if not run:
+        break
+      run.sort()
+      runs.append(os.path.join(tmp, f'run{len(runs)}'))
+      with open(runs[-1], 'wb') as file:
+        file.write(b''.join(run))
+      del run
+    # Merge at most MERGE_FAN_IN runs at a time to stay under the open file limit
+    while len(runs) > MERGE_FAN_IN:
+      groups = [runs[i:i + MERGE_FAN_IN] for i in range(0, len(runs), MERGE_FAN_IN)]
+      runs = [os.path.join(tmp, f'merge{len(runs)}_{i}') for i in range(len(groups))]
+      for group, out in zip(groups, runs):
+        _merge_runs(group, out)
+    out = os.path.join(tmp, 'merged')
+    count = _merge_runs(runs, out)
+    os.replace(out, path)
+  return count
+
+def _merge_runs(runs, out):
+  count = 0
+  with open(out, 'wb') as file:
+    last = None
+    for digest in heapq.merge(*map(_read_run, runs)):
+      if digest != last:
+        file.write(digest)
+        count += 1
+        last = digest
+  for run in runs:
+    os.remove(run)
+  return count
+
+def score_password(password, breach_list=None):
+  """zxcvbn score and feedback for one password, cached by its hash."""
+  return score_passwords([password], breach_list)[0]
+
+def score_passwords(passwords, breach_list=None, workers=None, inline_below=64):
+  """Score many passwords at once.
+
+  Breached passwords are answered from breach_list without running zxcvbn,
+  repeats come from the cache, and what is left is spread over a process
+  pool (zxcvbn is pure Python, so threads wouldn't help).
+  """
+  # The breach list goes first: the cache only holds zxcvbn scores, which
+  # a password scored earlier without a breach list would otherwise get
+  results = [None] * len(passwords)
+  todo = {}
+  for i, password in enumerate(passwords):
+    if breach_list is not None and password in breach_list:
+      results[i] = BREACHED
+      continue
+    key = _cache_key(password)
+    results[i] = _cache_get(key)
+    if results[i] is None:
+      todo.setdefault(key, (password, []))[1].append(i)
+
+  pool = ProcessPoolExecutor(max_workers=workers) if len(todo) >= inline_below else None
+  try:
+    unique = [password for password, _ in todo.values()]
+    scored = pool.map(_zxcvbn_score, unique, chunksize=256) if pool else map(_zxcvbn_score, unique)
+    for (key, (_, positions)), result in zip(todo.items(), scored):
+      _cache_put(key, result)
+      for i in positions:
+        results[i] = result
+  finally:
+    if pool:
+      pool.shutdown()
+  return results
+
+def password_strength(password):
+  result = score_password(password)
+  score = result['score']  # 'Score' - (0 to 4)
+
+  if score==3:
+    response = "Strong enough passsword: score of 3"
+  elif score == 4:
+    response = "Very strong password: score of 4"
+  else:
+    feedback = result.get('feedback')
+    warning = feedback.get('warning')
+    suggestions = feedback.get('suggestions')
+    response = f"Weak password: score of {score}\nWarning: {warning}\nSuggestions: {(suggestions or [''])[0]}"
+  return response
+
+def hash_password(password):
+  salt = bcrypt.gensalt()
+  hashed = bcrypt.hashpw(password.encode(), salt)
+  return hashed
+
+def verify_password(password_attempt, hashed):
+  if bcrypt.checkpw(password_attempt.encode(), hashed):
+    return "Password is correct. Access granted!"
+  return "Incorrect password. Access denied!"
+
+MIN_ROUNDS = 10
+MAX_ROUNDS = 18
+
+@lru_cache(maxsize=None)
+def calibrate_rounds(target_ms=250, min_rounds=MIN_ROUNDS, max_rounds=MAX_ROUNDS):
+  """Highest bcrypt cost whose hash takes at most target_ms on this machine.
+
+  Each extra round doubles the work, so one timing at a cheap cost is
+  enough to extrapolate the rest.
+  """
+  probe_rounds = 8
+  salt = bcrypt.gensalt(rounds=probe_rounds)
+  elapsed = min(_time_hash(salt) for _ in range(3))
+  rounds = probe_rounds
+  while rounds < max_rounds and elapsed * 2 ** (rounds + 1 - probe_rounds) * 1000 <= target_ms:
+    rounds += 1
+  return max(rounds, min_rounds)
+
+def _time_hash(salt):
+  start = time.perf_counter()
+  bcrypt.hashpw(b'calibration', salt)
+  return time.perf_counter() - start
+
+def hash_rounds(hashed):
+  # $2b$12$<salt+hash>
+  return int(hashed.split(b'$')[2])
+
+class PasswordService:
+  """bcrypt on a bounded thread pool, with sync and asyncio entry points.
+
+  bcrypt releases the GIL while it hashes, so a small pool runs one hash
+  per core without holding up the request threads or the event loop. The
+  cost is calibrated to target_ms unless rounds is given, and login()
+  upgrades hashes made with a lower cost once the password is known.
+  """
+
+  def __init__(self, rounds=None, target_ms=250, workers=None):
+    self.rounds = rounds or calibrate_rounds(target_ms)
+    self.pool = ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1, thread_name_prefix='bcrypt')
+
+  def _hash(self, password):
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds=self.rounds))
+
+  def _verify(self, password, hashed):
+    return bcrypt.checkpw(password.encode(), hashed)
+
+  def _login(self, password, hashed):
+    if not self._verify(password, hashed):
+      return False, None
+    if self.needs_rehash(hashed):
+      return True, self._hash(password)
+    return True, None
+
+  def needs_rehash(self, hashed):
+    return hash_rounds(hashed) < self.rounds
+
+  def hash(self, password):
+    return self.pool.submit(self._hash, password).result()
+
+  def verify(self, password, hashed):
+    return self.pool.submit(self._verify, password, hashed).result()
+
+  def login(self, password, hashed):
+    """Return (ok, new_hash); new_hash is set when the stored hash should be replaced."""
+    return self.pool.submit(self._login, password, hashed).result()
+
+  async def hash_async(self, password):
+    return await asyncio.get_running_loop().run_in_executor(self.pool, self._hash, password)
+
+  async def verify_async(self, password, hashed):
+    return await asyncio.get_running_loop().run_in_executor(self.pool, self._verify, password, hashed)
+
+  async def login_async(self, password, hashed):
+    return await asyncio.get_running_loop().run_in_executor(self.pool, self._login, password, hashed)
+
+  def close(self):
+    self.pool.shutdown()
+
+def benchmark(logins=32, target_ms=100):
+  service = PasswordService(target_ms=target_ms)
+  print(f'calibrated cost {service.rounds} for {target_ms} ms on {os.cpu_count()} cores')
+  stored = bcrypt.hashpw(b'correct horse', bcrypt.gensalt(rounds=service.rounds))
+
+  start = time.perf_counter()
+  for _ in range(logins):
+    bcrypt.checkpw(b'correct horse', stored)
+  serial = time.perf_counter() - start
+
+  async def run():
+    beats, stalls = 0, 0.0
+
+    async def heartbeat():
+      nonlocal beats, stalls
+      while True:
+        before = time.perf_counter()
+        await asyncio.sleep(0.01)
+        stalls = max(stalls, time.perf_counter() - before - 0.01)
+        beats += 1
+
+    ticker = asyncio.create_task(heartbeat())
+    start = time.perf_counter()
+    await asyncio.gather(*(service.login_async('correct horse', stored) for _ in range(logins)))
+    elapsed = time.perf_counter() - start
+    ticker.cancel()
+    return elapsed, stalls
+
+  pooled, stall = asyncio.run(run())
+  print(f'serial: {logins / serial:6.1f} logins/s')
+  print(f'pool:   {logins / pooled:6.1f} logins/s, longest event loop stall {stall * 1000:.1f} ms')
+
+  old = bcrypt.hashpw(b'correct horse', bcrypt.gensalt(rounds=MIN_ROUNDS - 6))
+  ok, upgraded = service.login('correct horse', old)
+  print(f'rehash on login: cost {hash_rounds(old)} -> {hash_rounds(upgraded)}' if upgraded else 'no rehash needed')
+  service.close()
+
+def audit(path, breach_path=None, workers=None):
+  with open(path, encoding='utf-8', errors='replace') as file:
+    passwords = [line.rstrip('\r\n') for line in file if line.strip()]
+  breach_list = BreachList(breach_path) if breach_path else None
+  start = time.perf_counter()
+  results = score_passwords(passwords, breach_list, workers)
+  elapsed = time.perf_counter() - start
+  breached = sum(r is BREACHED for r in results)
+  scores = Counter(r['score'] for r in results)
+  print(f"{len(passwords):,} passwords in {elapsed:.2f}s ({len(passwords) / max(elapsed, 1e-9):,.0f}/s), "
+        f"{breached:,} found in the breach list")
+  for score in range(5):
+    print(f"  score {score}: {scores[score]:,}")
+
+def main():
+  parser = argparse.ArgumentParser(description='Check, hash and audit passwords.')
+  commands = parser.add_subparsers(dest='command')
+  commands.add_parser('bench', help='bcrypt service throughput')
+  cmd = commands.add_parser('audit', help='score a file of passwords, one per line')
+  cmd.add_argument('passwords')
+  cmd.add_argument('--breach', help='breach list built with build-breach')
+  cmd.add_argument('-j', '--workers', type=int, default=None)
+  cmd = commands.add_parser('build-breach', help='build a breach list from passwords or SHA-1 hex lines')
+  cmd.add_argument('source')
+  cmd.add_argument('out')
+  cmd.add_argument('--format', choices=BREACH_FORMATS, default='plain',
+                   help="source lines: 'plain' passwords or HIBP 'sha1' hex digests")
+  args = parser.parse_args()
+
+  if args.command == 'bench':
+    benchmark()
+  elif args.command == 'audit':
+    audit(args.passwords, args.breach, args.workers)
+  elif args.command == 'build-breach':
+    print(f"{build_breach_list(args.source, args.out, args.format):,} digests written to {args.out}")
+  else:
+    while True:
+      password1 = getpass("Enter a password to check strength: ")
+      strength = password_strength(password1)
+      print(strength)
+      if strength.startswith("Weak"):
+        print("Choose a stronger password.")
+      else:
+        break
+    hashed_password = hash_password(password1)
+    print("Hashed password: ", hashed_password)
+    attempt = getpass("Re-enter the password to verify: ")
+    print(verify_password(attempt, hashed_password))
+
+if __name__ == "__main__":
+  main()
@@ -1,276 +1,397 @@
-from shiny import App, ui, render, reactive
-import pandas as pd
-import datetime
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-import uuid
-from io import BytesIO
-
-# Reactive storage
-items = reactive.Value(pd.DataFrame(columns=["id", "Product_Code", "Qty", "Category", "Price"]))
-edit_uuid = reactive.Value(None)
-
-app_ui = ui.page_sidebar(
-    ui.sidebar(
-        ui.input_text("code", "Product_Code", ""),
-        ui.input_select(
-            "desc", "Category",
-            {"Shirt": "Shirt", "Pants": "Pants", "T-Shirt": "T-Shirt", "Trouser": "Trouser"},
-        ),
-        ui.input_numeric("qty", "Quantity", 1, min=1),
-        ui.input_numeric("price", "Price", 0, min=0.0, step=0.01),
-        ui.input_slider("tax_rate", "Tax (%)", 0, 20, 8, step=1),
-        ui.layout_columns(
-            ui.column(
-                3,
-                ui.input_action_button(
-                    "add", "➕ Add Item",
-                    class_="btn btn-sm",
-                    style=(
-                        "background-color:#028a7e; color:white; border: 1px solid rgba(255, 255, 255, 0.4); border-radius: 12px; backdrop-filter: blur(8px); font-weight:bold; "
-                        "padding:6px 0; height:75px; width:69px;"
-                    )
-                )
-            ),
-            ui.column(
-                4,
-                ui.input_action_button(
-                    "update", "✏️ Update Item",
-                    class_="btn btn-sm",
-                    style=(
-                        "background-color:#f0ad4e; color:white; border: 1px solid rgba(255, 255, 255, 0.4); border-radius: 12px; backdrop-filter: blur(8px); font-weight:bold; "
-                        "padding:8px 0; height:75px; width:70px;"
-                    )
-                )
-            ),
-            ui.column(
-                5,
-                ui.input_action_button(
-                    "clear", "🗑️ Clear All",
-                    class_="btn btn-sm",
-                    style=(
-                        "background-color:#d9534f; color:white; border: 1px solid rgba(255, 255, 255, 0.4); border-radius: 12px; backdrop-filter: blur(8px); font-weight:bold; "
-                        "padding:8px 0; height:75px; width:69px;"
-                    )
-                )
-            ),
-        ),
-        ui.download_button(
-            "download_pdf", "🧾 Download Receipt",
-            class_="btn btn-sm",
-            style="background-color:#6c757d; color:white; border:none; font-weight:bold; width:100%;"
-        ),
-    ),
-    ui.tags.style("""body { background: #036c5f !important; }"""),
-    ui.layout_columns(
-        ui.card(
-            ui.card_header("Items Added"),
-            ui.output_ui("items_table"),
-        ),
-        ui.card(
-            ui.card_header("Generated Receipt"),
-            ui.output_ui("receipt"),
-        ),
-    ),
-)
-
-def server(input, output, session):
-    @reactive.effect
-    @reactive.event(input.add)
-    def _add():
-        df = items.get().copy()
-        df = pd.concat(
-            [df, pd.DataFrame([{
-                "id": uuid.uuid4().hex,
-                "Product_Code": input.code(),
-                "Qty": input.qty(),
-                "Category": input.desc(),
-                "Price": input.price(),
-            }])],
-            ignore_index=True,
-        )
-        items.set(df)
-
-    @reactive.effect
-    @reactive.event(input.update)
-    def _update():
-        uid = edit_uuid.get()
-        if uid is not None:
-            df = items.get().copy()
-            idx = df.index[df["id"] == uid].tolist()
-            if idx:
-                df.loc[idx[0]] = {
-                    "id": uid,
-                    "Product_Code": input.code(),
-                    "Qty": input.qty(),
-                    "Category": input.desc(),
-                    "Price": input.price(),
-                }
-                items.set(df)
-                edit_uuid.set(None)
-
-    @reactive.effect
-    @reactive.event(input.clear)
-    def _clear():
-        items.set(pd.DataFrame(columns=["id", "Product_Code", "Qty", "Category", "Price"]))
-
-    @reactive.effect
-    @reactive.event(input.remove_id)
-    def _remove():
-        uid = input.remove_id()
-        df = items.get().copy()
-        idx = df.index[df["id"] == uid].tolist()
-        if idx:
-            df = df.drop(idx[0]).reset_index(drop=True)
-            items.set(df)
-
-    @reactive.effect
-    @reactive.event(input.edit_id)
-    def _edit():
-        uid = input.edit_id()
-        df = items.get().copy()
-        idx = df.index[df["id"] == uid].tolist()
-        if idx:
-            row = df.iloc[idx[0]]
-            session.send_input_message("code", {"value": str(row["Product_Code"])})
-            session.send_input_message("desc", {"value": str(row["Category"])})
-            session.send_input_message("qty", {"value": float(row["Qty"])})
-            session.send_input_message("price", {"value": float(row["Price"])})
-            edit_uuid.set(uid)
-
-    @output
-    @render.ui
-    def items_table():
-        df = items.get()
-        if df.empty:
-            return ui.p("No items yet.")
-
-        rows_html = []
-        for r in df.itertuples():
-            rows_html.append(f"""
-                <tr>
-                  <td style="white-space:nowrap;">
-                    <button class="btn btn-sm btn-warning"
-                        onclick="Shiny.setInputValue('edit_id', '{r.id}', {{priority:'event'}})">✏️ Edit</button>
-                    <button class="btn btn-sm btn-danger"
-                        onclick="Shiny.setInputValue('remove_id', '{r.id}', {{priority:'event'}})">❎ Delete</button>
-                  </td>
-                  <td>{r.Product_Code}</td>
-                  <td>{r.Qty}</td>
-                  <td>{r.Category}</td>
-                  <td>{r.Price:.2f}</td>
-                </tr>
-            """)
-
-        return ui.HTML(f"""
-            <table class="table table-sm" style="font-size:13px; border-collapse:collapse;">
-              <thead>
-                <tr><th style="width:140px;">Actions</th><th>Product_Code</th><th>Qty</th><th>Item</th><th>Price</th></tr>
-              </thead>
-              <tbody>
-                {''.join(rows_html)}
-              </tbody>
-            </table>
-        """)
-
-    @output
-    @render.ui
-    def receipt():
-        df = items.get()
-        if df.empty:
-            return ui.p("No items yet.")
-
-        subtotal = float((df["Qty"] * df["Price"]).sum())
-        tax_rate = input.tax_rate() / 100.0
-        tax = round(subtotal * tax_rate, 2)
-        total = round(subtotal + tax, 2)
-        now = datetime.datetime.now()
-
-        lines = "".join(
-            f"<tr><td>{row.Product_Code}</td><td>{row.Qty}</td><td>{row.Category}</td><td>{row.Price:.2f}</td></tr>"
-            for row in df.itertuples()
-        )
-
-        return ui.HTML(f"""
-        <div style="border-radius:10px; background-color:#f7f7f7; padding:10px; width:300px; font-family:Arial, sans-serif; font-size:13px">
-          <h4 style="text-align:center; margin:0; color:#028a7e;">RECEIPT 🧾</h4>
-          <hr style="margin:4px 0; border-color:#028a7e;">
-          <table style="width:100%; font-size:12px; border-collapse:collapse;">
-            <tr style="background-color:#028a7e; color:white;">
-                <th>Product_Code</th><th>Qty</th><th>Item</th><th>Price</th>
-            </tr>
-            {lines}
-          </table>
-          <hr style="margin:4px 0;">
-          <p style="margin:2px 0;">Subtotal: {subtotal:.2f}</p>
-          <p style="margin:2px 0;">Tax ({input.tax_rate()}%): {tax:.2f}</p>
-          <p style="margin:2px 0; font-weight:bold;">Total: {total:.2f}</p>
-          <hr style="margin:4px 0;">
-          <p style="margin:2px 0;">Date: {now.strftime('%d/%m/%Y')}</p>
-          <p style="margin:2px 0;">Time: {now.strftime('%I:%M %p')}</p>
-        </div>
-        """)
-
-    @render.download(filename=lambda: f"receipt_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf")
-    def download_pdf():
-        df = items.get()
-        if df.empty:
-            yield b""
-            return
-
-        subtotal = float((df["Qty"] * df["Price"]).sum())
-        tax_rate = input.tax_rate() / 100.0
-        tax = round(subtotal * tax_rate, 2)
-        total = round(subtotal + tax, 2)
-        now = datetime.datetime.now()
-
-        buffer = BytesIO()
-        RECEIPT_WIDTH, RECEIPT_HEIGHT = 250, 600
-        doc = SimpleDocTemplate(buffer, pagesize=(RECEIPT_WIDTH, RECEIPT_HEIGHT),
-                                leftMargin=10, rightMargin=10, topMargin=10, bottomMargin=10)
-        styles = getSampleStyleSheet()
-        elements = []
-
-        # Custom header style
-        header_style = ParagraphStyle('header', fontSize=14, textColor=colors.HexColor("#028a7e"), alignment=1, spaceAfter=6)
-        normal_style = ParagraphStyle('normal', fontSize=10)
-        bold_style = ParagraphStyle('bold', fontSize=10, leading=12, spaceAfter=2, fontName="Helvetica-Bold")
-
-        # Header
-        elements.append(Paragraph("PARZi GLOBAL", header_style))
-        elements.append(Paragraph(f"Receipt No.: {now.strftime('%Y%m%d%H%M%S')}", normal_style))
-        elements.append(Spacer(1, 8))
-
-        # Table data
-        data = [["Product_Code", "Qty", "Item", "Price"]]
-        for row in df.itertuples():
-            data.append([row.Product_Code, row.Qty, row.Category, f"{row.Price:.2f}"])
-        table = Table(data, colWidths=[60, 30, 80, 50])
-        table.setStyle(TableStyle([
-            ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#028a7e")),
-            ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
-            ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
-            ("FONTNAME", (0, 0), (-1, -1), "Helvetica"),
-            ("FONTSIZE", (0, 0), (-1, -1), 9),
-            ("ALIGN", (1, 1), (-1, -1), "CENTER"),
-        ]))
-        elements.append(table)
-        elements.append(Spacer(1, 8))
-
-        # Totals
-        elements.append(Paragraph(f"Subtotal: {subtotal:.2f}", normal_style))
-        elements.append(Paragraph(f"Tax ({input.tax_rate()}%): {tax:.2f}", normal_style))
-        elements.append(Paragraph(f"Total: {total:.2f}", bold_style))
-        elements.append(Spacer(1, 8))
-
-        # Date/Time
-        elements.append(Paragraph(f"Date: {now.strftime('%d/%m/%Y')}", normal_style))
-        elements.append(Paragraph(f"Time: {now.strftime('%I:%M %p')}", normal_style))
-
-        doc.build(elements)
-        buffer.seek(0)
-        yield buffer.read()
-
-app = App(app_ui, server)
+from shiny import App, ui, render, reactive
+import asyncio
+import atexit
+import datetime
+import os
+from collections import deque
+from product_catalogue import open_catalogue
+from receipt_pdf import receipt_totals, render_receipt
+from sales_journal import open_worker_journal
+from sales_rollups import SalesRollups
+
+CATEGORIES = {"Shirt": "Shirt", "Pants": "Pants", "T-Shirt": "T-Shirt", "Trouser": "Trouser"}
+
+# Optional product catalogue (CSV or Parquet); its index is memory-mapped and shared by all workers
+catalogue = open_catalogue(os.environ["CATALOGUE_PATH"]) if os.environ.get("CATALOGUE_PATH") else None
+
+# Basket storage, rebuilt from the sales journal on start-up; each worker
+# process claims its own journal under SALES_JOURNAL_DIR.
+# items_version is bumped when the outputs need a full re-render
+JOURNAL_ROOT = os.environ.get("SALES_JOURNAL_DIR", "sales_journal")
+journal = open_worker_journal(JOURNAL_ROOT)
+atexit.register(journal.close)
+BASKET = os.environ.get("COUNTER_ID", "counter")
+items = journal.basket(BASKET)
+
+# Dashboard totals over every worker's sales, updated as each receipt completes
+rollups = SalesRollups(os.path.join(JOURNAL_ROOT, "rollups.sqlite3"))
+rollups.catch_up(journal)
+sales_version = reactive.Value(0)
+items_version = reactive.Value(0)
+edit_uuid = reactive.Value(None)
+# Row patches for basket edits, numbered by items_patch_seq; every session
+# drains the ones it hasn't sent yet, so all open pages stay in step
+items_patches = deque(maxlen=256)
+items_patch_seq = reactive.Value(0)
+# (rows, tax_pct, time) of each basket's last sale, for repeat downloads
+last_receipt = {}
+
+app_ui = ui.page_sidebar(
+    ui.sidebar(
+        ui.input_text("code", "Product_Code", ""),
+        ui.tags.datalist(id="code-options"),
+        ui.input_select("desc", "Category", CATEGORIES),
+        ui.input_numeric("qty", "Quantity", 1, min=1),
+        ui.input_numeric("price", "Price", 0, min=0.0, step=0.01),
+        ui.input_slider("tax_rate", "Tax (%)", 0, 20, 8, step=1),
+        ui.layout_columns(
+            ui.column(
+                3,
+                ui.input_action_button(
+                    "add", "➕ Add Item",
+                    class_="btn btn-sm",
+                    style=(
+                        "background-color:#028a7e; color:white; border: 1px solid rgba(255, 255, 255, 0.4); border-radius: 12px; backdrop-filter: blur(8px); font-weight:bold; "
+                        "padding:6px 0; height:75px; width:69px;"
+                    )
+                )
+            ),
+            ui.column(
+                4,
+                ui.input_action_button(
+                    "update", "✏️ Update Item",
+                    class_="btn btn-sm",
+                    style=(
+                        "background-color:#f0ad4e; color:white; border: 1px solid rgba(255, 255, 255, 0.4); border-radius: 12px; backdrop-filter: blur(8px); font-weight:bold; "
+                        "padding:8px 0; height:75px; width:70px;"
+                    )
+                )
+            ),
+            ui.column(
+                5,
+                ui.input_action_button(
+                    "clear", "🗑️ Clear All",
+                    class_="btn btn-sm",
+                    style=(
+                        "background-color:#d9534f; color:white; border: 1px solid rgba(255, 255, 255, 0.4); border-radius: 12px; backdrop-filter: blur(8px); font-weight:bold; "
+                        "padding:8px 0; height:75px; width:69px;"
+                    )
+                )
+            ),
+        ),
+        ui.download_button(
+            "download_pdf", "🧾 Download Receipt",
+            class_="btn btn-sm",
+            style="background-color:#6c757d; color:white; border:none; font-weight:bold; width:100%;"
+        ),
+    ),
+    ui.tags.style("""body { background: #036c5f !important; }"""),
+    # Applies row-level patches sent by the server instead of re-rendering the tables
+    ui.tags.script("""
+        document.getElementById('code').setAttribute('list', 'code-options');
+        Shiny.addCustomMessageHandler('code_options', function(m) {
+          var list = document.getElementById('code-options');
+          list.replaceChildren.apply(list, m.codes.map(function(c) {
+            var opt = document.createElement('option');
+            opt.value = c;
+            return opt;
+          }));
+        });
+        Shiny.addCustomMessageHandler('items_patch', function(m) {
+          [['item-', 'items-body', m.item_row], ['receipt-', 'receipt-body', m.receipt_row]].forEach(function(p) {
+            var old = document.getElementById(p[0] + m.id);
+            if (m.op === 'remove') { if (old) old.remove(); return; }
+            var tpl = document.createElement('template');
+            tpl.innerHTML = p[2].trim();
+            if (old) old.replaceWith(tpl.content.firstChild);
+            else document.getElementById(p[1]).appendChild(tpl.content.firstChild);
+          });
+          ['subtotal', 'tax', 'total'].forEach(function(k) {
+            var el = document.getElementById('receipt-' + k);
+            if (el) el.textContent = m[k];
+          });
+        });
+    """),
+    ui.navset_tab(
+        ui.nav_panel(
+            "Basket",
+            ui.layout_columns(
+                ui.card(
+                    ui.card_header("Items Added"),
+                    ui.output_ui("items_table"),
+                ),
+                ui.card(
+                    ui.card_header("Generated Receipt"),
+                    ui.output_ui("receipt"),
+                ),
+            ),
+        ),
+        ui.nav_panel(
+            "Reports",
+            ui.layout_columns(
+                ui.card(
+                    ui.card_header("Sales by Category"),
+                    ui.output_ui("report_category"),
+                ),
+                ui.card(
+                    ui.card_header("Sales by Hour (today)"),
+                    ui.output_ui("report_hour"),
+                ),
+                ui.card(
+                    ui.card_header("Top Products"),
+                    ui.output_ui("report_products"),
+                ),
+            ),
+        ),
+    ),
+)
+
+def _item_row(r):
+    return f"""<tr id="item-{r.id}">
+      <td style="white-space:nowrap;">
+        <button class="btn btn-sm btn-warning"
+            onclick="Shiny.setInputValue('edit_id', '{r.id}', {{priority:'event'}})">✏️ Edit</button>
+        <button class="btn btn-sm btn-danger"
+            onclick="Shiny.setInputValue('remove_id', '{r.id}', {{priority:'event'}})">❎ Delete</button>
+      </td>
+      <td>{r.Product_Code}</td>
+      <td>{r.Qty:g}</td>
+      <td>{r.Category}</td>
+      <td>{r.Price:.2f}</td>
+    </tr>"""
+
+def _receipt_row(r):
+    return f"<tr id=\"receipt-{r.id}\"><td>{r.Product_Code}</td><td>{r.Qty:g}</td><td>{r.Category}</td><td>{r.Price:.2f}</td></tr>"
+
+def _report_table(headers, rows):
+    if not rows:
+        return ui.p("No sales yet.")
+    head = "".join(f"<th>{h}</th>" for h in headers)
+    body = "".join(
+        "<tr>" + "".join(f"<td>{v:.2f}</td>" if isinstance(v, float) else f"<td>{v}</td>" for v in row) + "</tr>"
+        for row in rows
+    )
+    return ui.HTML(f"""
+        <table class="table table-sm" style="font-size:13px;">
+          <thead><tr>{head}</tr></thead>
+          <tbody>{body}</tbody>
+        </table>
+    """)
+
+def server(input, output, session):
+    with reactive.isolate():
+        patches_sent = items_patch_seq.get()
+    # Bumped when this session missed patches and has to re-render instead
+    refresh = reactive.Value(0)
+
+    def _totals():
+        subtotal = items.subtotal()
+        return (subtotal, *receipt_totals(subtotal, input.tax_rate()))
+
+    def _changed(op, uid):
+        # Structural changes re-render both outputs; anything else only ships
+        # the affected <tr> and the new totals to the pages
+        if op == "clear" or len(items) == (1 if op == "add" else 0):
+            items_version.set(items_version.get() + 1)
+            return
+        patch = {"op": op, "id": uid}
+        if op != "remove":
+            row = items.get(uid)
+            patch["item_row"] = _item_row(row)
+            patch["receipt_row"] = _receipt_row(row)
+        seq = items_patch_seq.get() + 1
+        items_patches.append((seq, patch))
+        items_patch_seq.set(seq)
+
+    @reactive.effect
+    async def _send_patches():
+        nonlocal patches_sent
+        seq = items_patch_seq.get()
+        pending = [patch for n, patch in items_patches if n > patches_sent]
+        missed = seq - patches_sent > len(pending)
+        patches_sent = seq
+        with reactive.isolate():
+            if missed:
+                refresh.set(refresh.get() + 1)
+                return
+            subtotal, tax, total = _totals()
+        # Totals use this session's tax rate and are the same for every patch in the batch
+        for patch in pending:
+            await session.send_custom_message("items_patch", dict(
+                patch, subtotal=f"{subtotal:.2f}", tax=f"{tax:.2f}", total=f"{total:.2f}"))
+
+    @reactive.effect
+    @reactive.event(input.add)
+    def _add():
+        uid = journal.add(BASKET, input.code(), input.qty(), input.desc(), input.price())
+        _changed("add", uid)
+
+    @reactive.effect
+    @reactive.event(input.update)
+    def _update():
+        uid = edit_uuid.get()
+        if uid is not None:
+            if journal.update(BASKET, uid, input.code(), input.qty(), input.desc(), input.price()):
+                _changed("update", uid)
+                edit_uuid.set(None)
+
+    @reactive.effect
+    @reactive.event(input.clear)
+    def _clear():
+        journal.clear(BASKET)
+        _changed("clear", None)
+
+    @reactive.effect
+    @reactive.event(input.remove_id)
+    def _remove():
+        uid = input.remove_id()
+        if journal.remove(BASKET, uid):
+            _changed("remove", uid)
+
+    @reactive.effect
+    @reactive.event(input.edit_id)
+    def _edit():
+        uid = input.edit_id()
+        row = items.get(uid)
+        if row is not None:
+            session.send_input_message("code", {"value": str(row.Product_Code)})
+            session.send_input_message("desc", {"value": str(row.Category)})
+            session.send_input_message("qty", {"value": float(row.Qty)})
+            session.send_input_message("price", {"value": float(row.Price)})
+            edit_uuid.set(uid)
+
+    @reactive.effect
+    async def _lookup_code():
+        code = input.code()
+        if catalogue is None or not code:
+            return
+        await session.send_custom_message("code_options", {"codes": catalogue.prefix(code)})
+        hit = catalogue.lookup(code)
+        with reactive.isolate():
+            editing = edit_uuid.get() is not None
+        # Leave the fields alone while an existing line is loaded for editing
+        if hit is not None and not editing:
+            category, price = hit
+            if category in CATEGORIES:
+                ui.update_select("desc", selected=category)
+            else:
+                ui.update_select("desc", choices={**CATEGORIES, category: category}, selected=category)
+            ui.update_numeric("price", value=price)
+
+    @output
+    @render.ui
+    def items_table():
+        items_version.get()
+        refresh.get()
+        if not items:
+            return ui.p("No items yet.")
+
+        return ui.HTML(f"""
+            <table class="table table-sm" style="font-size:13px; border-collapse:collapse;">
+              <thead>
+                <tr><th style="width:140px;">Actions</th><th>Product_Code</th><th>Qty</th><th>Item</th><th>Price</th></tr>
+              </thead>
+              <tbody id="items-body">
+                {''.join(_item_row(r) for r in items)}
+              </tbody>
+            </table>
+        """)
+
+    @output
+    @render.ui
+    def receipt():
+        items_version.get()
+        refresh.get()
+        if not items:
+            return ui.p("No items yet.")
+
+        subtotal, tax, total = _totals()
+        now = datetime.datetime.now()
+
+        return ui.HTML(f"""
+        <div style="border-radius:10px; background-color:#f7f7f7; padding:10px; width:300px; font-family:Arial, sans-serif; font-size:13px">
+          <h4 style="text-align:center; margin:0; color:#028a7e;">RECEIPT 🧾</h4>
+          <hr style="margin:4px 0; border-color:#028a7e;">
+          <table style="width:100%; font-size:12px; border-collapse:collapse;">
+            <thead>
+              <tr style="background-color:#028a7e; color:white;">
+                  <th>Product_Code</th><th>Qty</th><th>Item</th><th>Price</th>
+              </tr>
+            </thead>
+            <tbody id="receipt-body">
+              {''.join(_receipt_row(r) for r in items)}
+            </tbody>
+          </table>
+          <hr style="margin:4px 0;">
+          <p style="margin:2px 0;">Subtotal: <span id="receipt-subtotal">{subtotal:.2f}</span></p>
+          <p style="margin:2px 0;">Tax ({input.tax_rate()}%): <span id="receipt-tax">{tax:.2f}</span></p>
+          <p style="margin:2px 0; font-weight:bold;">Total: <span id="receipt-total">{total:.2f}</span></p>
+          <hr style="margin:4px 0;">
+          <p style="margin:2px 0;">Date: {now.strftime('%d/%m/%Y')}</p>
+          <p style="margin:2px 0;">Time: {now.strftime('%I:%M %p')}</p>
+        </div>
+        """)
+
+    @render.download(filename=lambda: f"receipt_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf")
+    async def download_pdf():
+        if not items:
+            # The basket closed with its last sale; download that receipt again
+            if BASKET not in last_receipt:
+                yield b""
+                return
+            async for chunk in render_receipt(*last_receipt[BASKET]):
+                yield chunk
+            return
+
+        tax_pct = input.tax_rate()
+        while True:
+            now = datetime.datetime.now()
+            version = items.version
+            rows = [(r.Product_Code, r.Qty, r.Category, r.Price) for r in items]
+            chunks = render_receipt(rows, tax_pct, now)
+            # The PDF is fully built before the first chunk arrives, so a failed
+            # render leaves the basket open and the sale unrecorded
+            first = await anext(chunks)
+            # Another session may have edited the basket meanwhile; the sale
+            # has to match the receipt, so render it again
+            if items.version == version:
+                break
+            await chunks.aclose()
+            if not items:
+                yield b""
+                return
+        seq = journal.sale(BASKET, now.strftime('%Y%m%d%H%M%S'), tax_pct, now)
+        last_receipt[BASKET] = (rows, tax_pct, now)
+        items_version.set(items_version.get() + 1)
+        # Anything lost to a crash before the rollup is picked up by catch_up() on the next start
+        rollups.record_sale(now, rows, journal.name, seq)
+        sales_version.set(sales_version.get() + 1)
+        yield first
+        async for chunk in chunks:
+            yield chunk
+        await asyncio.to_thread(journal.wait, seq)
+
+    # Reports read the rollup tables only; the timer picks up sales made on other workers
+    @output
+    @render.ui
+    def report_category():
+        sales_version.get()
+        reactive.invalidate_later(30)
+        return _report_table(["Category", "Qty", "Revenue"], rollups.by_category())
+
+    @output
+    @render.ui
+    def report_hour():
+        sales_version.get()
+        reactive.invalidate_later(30)
+        return _report_table(["Hour", "Receipts", "Qty", "Revenue"],
+                             rollups.by_hour(datetime.date.today().isoformat()))
+
+    @output
+    @render.ui
+    def report_products():
+        sales_version.get()
+        reactive.invalidate_later(30)
+        return _report_table(["Product_Code", "Category", "Qty", "Revenue"], rollups.top_products())
+
+app = App(app_ui, server)
@@ -0,0 +1,96 @@
+import argparse
+import datetime
+import hashlib
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from receipt_pdf import build_receipt_pdf, receipt_totals
+
+REQUIRED = ["basket_id", "Product_Code", "Qty", "Category", "Price"]
+# basket_id comes from the CSV; anything that could leave --out becomes "_"
+UNSAFE_FILENAME_CHARS = re.compile(r"[^\w.-]")
+
+
+def load_baskets(path):
+    df = pd.read_csv(path, dtype={"basket_id": str, "Product_Code": str, "Category": str})
+    missing = [c for c in REQUIRED if c not in df.columns]
+    if missing:
+        raise ValueError(f"{path} is missing columns: {', '.join(missing)}")
+    # groupby drops rows without a basket_id, so they would vanish from the summary
+    blank = df.index[df["basket_id"].isna() | (df["basket_id"].str.strip() == "")]
+    if len(blank):
+        lines = ", ".join(str(i + 2) for i in blank[:10]) + (", ..." if len(blank) > 10 else "")
+        raise ValueError(f"{path} has {len(blank)} rows without a basket_id (lines {lines})")
+    return df
+
+
+def receipt_filename(basket_id):
+    basket_id = str(basket_id)
+    name = UNSAFE_FILENAME_CHARS.sub("_", basket_id)
+    if name != basket_id:
+        # "a/b" and "a_b" would otherwise both become receipt_a_b.pdf
+        name += "-" + hashlib.sha1(basket_id.encode()).hexdigest()[:8]
+    return f"receipt_{name}.pdf"
+
+
+def basket_totals(df, tax_pct):
+    """Subtotal, tax and total for every basket in one grouped pass.
+
+    A tax_pct column in the input overrides the default rate per basket.
+    """
+    grouped = df.assign(line_total=df["Qty"] * df["Price"]).groupby("basket_id", sort=False)
+    totals = grouped["line_total"].sum().to_frame("subtotal")
+    totals["tax_pct"] = grouped["tax_pct"].first() if "tax_pct" in df.columns else tax_pct
+    totals["tax"], totals["total"] = receipt_totals(totals["subtotal"], totals["tax_pct"])
+    return totals
+
+
+def _render(job):
+    basket_id, rows, tax_pct, now, out_dir = job
+    path = os.path.join(out_dir, receipt_filename(basket_id))
+    with open(path, "wb") as file:
+        file.write(build_receipt_pdf(rows, tax_pct, now, receipt_no=basket_id))
+    return path
+
+
+def render_receipts(df, totals, out_dir, workers=None):
+    os.makedirs(out_dir, exist_ok=True)
+    now = datetime.datetime.now()
+    codes, qty = df["Product_Code"].tolist(), df["Qty"].tolist()
+    categories, prices = df["Category"].tolist(), df["Price"].tolist()
+    jobs = (
+        (basket_id, [(codes[i], qty[i], categories[i], prices[i]) for i in positions],
+         totals.at[basket_id, "tax_pct"], now, out_dir)
+        for basket_id, positions in df.groupby("basket_id", sort=False).indices.items()
+    )
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_render, jobs, chunksize=16))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a CSV of baskets and produce receipts in bulk.")
+    parser.add_argument("orders", help="CSV with basket_id, Product_Code, Qty, Category, Price [, tax_pct]")
+    parser.add_argument("--out", default="receipts", help="directory for the PDFs and summary.csv")
+    parser.add_argument("--tax", type=float, default=8, help="tax %% when the CSV has no tax_pct column")
+    parser.add_argument("--workers", type=int, default=None, help="PDF worker processes (default: all cores)")
+    parser.add_argument("--no-pdf", action="store_true", help="only write summary.csv")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    df = load_baskets(args.orders)
+    totals = basket_totals(df, args.tax)
+    os.makedirs(args.out, exist_ok=True)
+    totals.to_csv(os.path.join(args.out, "summary.csv"))
+    print(f"{len(totals):,} baskets / {len(df):,} lines totalled in {time.perf_counter() - start:.2f}s")
+
+    if not args.no_pdf:
+        start = time.perf_counter()
+        paths = render_receipts(df, totals, args.out, args.workers)
+        elapsed = time.perf_counter() - start
+        print(f"{len(paths):,} receipts rendered in {elapsed:.2f}s ({len(paths) / elapsed:,.1f}/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,408 @@
-import requests
-
-def get_exchange_rates(base, targets):
-    url = f"https://api.frankfurter.app/latest?from={base}&to={','.join(targets)}"
-    response = requests.get(url)
-    data = response.json()
-    return data.get("rates", {})
-
-# List of supported currencies
-currencies = ["INR", "USD", "GBP", "EUR", "SAR"]
-
-print("Available currencies:", ", ".join(currencies))
-base_currency = input("Choose base currency (e.g., USD): ").upper()
-
-if base_currency not in currencies:
-    print("Invalid currency! Please choose from the list.")
-else:
-    try:
-        amount = float(input(f"Enter amount in {base_currency}: "))
-    except ValueError:
-        print("Invalid amount entered!")
-        exit()
-
-    targets = [c for c in currencies if c != base_currency]
-    rates = get_exchange_rates(base_currency, targets)
-
-    print(f"\nExchange Rates for {amount} {base_currency}:\n")
-    for target, rate in rates.items():
-        converted = amount * rate
-        print(f"{amount} {base_currency} = {converted:.2f} {target}")
\ No newline at end of file
+import datetime
+import json
+import os
+import struct
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_right
+import requests
+from requests.adapters import HTTPAdapter
+
+API_URL = os.environ.get("FRANKFURTER_URL", "https://api.frankfurter.app")
+# Every rate is fetched against one pivot currency; any other pair is a
+# cross rate of two entries from that single response
+PIVOT = "EUR"
+
+
+class RateProvider:
+    """Exchange rates from Frankfurter over one pooled Session, with a TTL cache.
+
+    The ECB publishes new rates once per working day, so a fetched table is
+    reused from memory (and from cache_path across runs) until ttl seconds
+    have passed. With autosave off, new tables only reach cache_path when
+    save() is called, so a batch run writes the file once per batch.
+    """
+
+    def __init__(self, base_url=API_URL, ttl=6 * 3600, cache_path=None, timeout=10, autosave=True):
+        self.base_url = base_url.rstrip("/")
+        self.ttl = ttl
+        self.cache_path = cache_path
+        self.autosave = autosave
+        self._dirty = False
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+        self.session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+        self._cache = {}
+        self._lock = threading.Lock()
+        if cache_path and os.path.exists(cache_path):
+            with open(cache_path) as file:
+                self._cache = {tuple(k.split(":", 2)): tuple(v) for k, v in json.load(file).items()}
+
+    def save(self):
+        """Write the cache to cache_path if anything was fetched since the last save."""
+        with self._lock:
+            if not self.cache_path or not self._dirty:
+                return
+            tmp = f"{self.cache_path}.{os.getpid()}.tmp"
+            with open(tmp, "w") as file:
+                json.dump({":".join(k): v for k, v in self._cache.items()}, file)
+            os.replace(tmp, self.cache_path)
+            self._dirty = False
+
+    def fetch(self, base, targets=(), date=None):
+        """Rates from base to targets (all currencies when empty), cached by (date, base, targets).
+
+        date is an ISO day for historical rates; those never change, so they
+        are kept regardless of ttl.
+        """
+        key = (date or "latest", base, ",".join(sorted(targets)))
+        with self._lock:
+            cached = self._cache.get(key)
+        if cached and (date or time.time() - cached[0] < self.ttl):
+            return cached[1]
+        params = {"from": base}
+        if targets:
+            params["to"] = key[2]
+        response = self.session.get(f"{self.base_url}/{key[0]}", params=params, timeout=self.timeout)
+        response.raise_for_status()
+        rates = response.json().get("rates", {})
+        with self._lock:
+            self._cache[key] = (time.time(), rates)
+            self._dirty = True
+        if self.autosave:
+            self.save()
+        return rates
+
+    def table(self, date=None):
+        """Every currency's rate against PIVOT, including PIVOT itself."""
+        return dict(self.fetch(PIVOT, date=date), **{PIVOT: 1.0})
+
+    def rates(self, base, targets):
+        """Rates from base to each target, derived from the one pivot table; unknown codes are left out."""
+        table = self.table()
+        if base not in table:
+            return {}
+        return {t: table[t] / table[base] for t in targets if t in table and t != base}
+
+    def convert(self, amount, source, target):
+        table = self.table()
+        return amount * table[target] / table[source]
+
+
+SERIES_MAGIC = b"FXTS1\0\0\0"
+SERIES_HEADER = struct.Struct("<8sII")
+
+
+class _Series:
+    # Days are date ordinals, kept sorted; covered holds the (first, last)
+    # day ranges already asked for, since weekends and holidays have no rate
+    def __init__(self, days=None, rates=None, covered=None):
+        self.days = days or array("i")
+        self.rates = rates or array("d")
+        self.covered = covered or []
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as file:
+            data = file.read()
+        magic, points, ranges = SERIES_HEADER.unpack_from(data)
+        if magic != SERIES_MAGIC:
+            raise ValueError(f"{path} is not a rate series")
+        offset = SERIES_HEADER.size
+        covered, days, rates = array("i"), array("i"), array("d")
+        covered.frombytes(data[offset:offset + 8 * ranges])
+        offset += 8 * ranges
+        days.frombytes(data[offset:offset + 4 * points])
+        rates.frombytes(data[offset + 4 * points:offset + 12 * points])
+        return cls(days, rates, [(covered[i], covered[i + 1]) for i in range(0, len(covered), 2)])
+
+    def save(self, path):
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as file:
+            file.write(SERIES_HEADER.pack(SERIES_MAGIC, len(self.days), len(self.covered)))
+            file.write(array("i", [d for pair in self.covered for d in pair]).tobytes())
+            file.write(self.days.tobytes())
+            file.write(self.rates.tobytes())
+        os.replace(tmp, path)
+
+    def gaps(self, first, last):
+        """Day ranges inside [first, last] that haven't been fetched yet."""
+        gaps = []
+        for start, end in self.covered:
+            if end < first or start > last:
+                continue
+            if start > first:
+                gaps.append((first, start - 1))
+            first = max(first, end + 1)
+        if first <= last:
+            gaps.append((first, last))
+        return gaps
+
+    def merge(self, points, first, last):
+        merged = dict(zip(self.days, self.rates))
+        merged.update(points)
+        days = sorted(merged)
+        self.days, self.rates = array("i", days), array("d", (merged[d] for d in days))
+        if first > last:
+            return
+        covered = sorted(self.covered + [(first, last)])
+        self.covered = [covered[0]]
+        for start, end in covered[1:]:
+            if start <= self.covered[-1][1] + 1:
+                self.covered[-1] = (self.covered[-1][0], max(end, self.covered[-1][1]))
+            else:
+                self.covered.append((start, end))
+
+
+class RateHistory:
+    """Local store of daily rates, one compact binary file per currency pair.
+
+    Each file holds the fetched date ranges, then the business days and
+    their rates as two packed columns. Only the parts of a requested range
+    that were never fetched go to Frankfurter, as one range request per
+    gap for all the quotes asked for together; as-of lookups bisect the
+    day column. Today is never stored as covered, since its rate may not be
+    out yet, but it is only asked for again after today_ttl seconds.
+    """
+
+    def __init__(self, directory="fx_history", provider=None, today_ttl=15 * 60):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.provider = provider or RateProvider()
+        self.today_ttl = today_ttl
+        self._series = {}
+        self._today_checked = {}
+        self._lock = threading.Lock()
+
+    def _path(self, base, quote):
+        return os.path.join(self.directory, f"{base}_{quote}.bin")
+
+    def _get(self, base, quote):
+        series = self._series.get((base, quote))
+        if series is None:
+            path = self._path(base, quote)
+            series = _Series.load(path) if os.path.exists(path) else _Series()
+            self._series[base, quote] = series
+        return series
+
+    def ensure(self, base, quotes, start, end):
+        """Make sure every base/quote pair has rates for the days start..end (dates or ISO strings)."""
+        today = datetime.date.today().toordinal()
+        first, last = _day(start), min(_day(end), today)
+        now = time.time()
+        with self._lock:
+            series = {q: self._get(base, q) for q in quotes}
+            gaps = set()
+            for quote, s in series.items():
+                checked = self._today_checked.get((base, quote, today))
+                recent = checked is not None and now - checked < self.today_ttl
+                gaps.update(s.gaps(first, today - 1 if last == today and recent else last))
+            gaps = sorted(gaps)
+            for gap_first, gap_last in gaps:
+                span = f"{datetime.date.fromordinal(gap_first)}..{datetime.date.fromordinal(gap_last)}"
+                response = self.provider.session.get(f"{self.provider.base_url}/{span}",
+                                                     params={"from": base, "to": ",".join(quotes)},
+                                                     timeout=self.provider.timeout)
+                response.raise_for_status()
+                by_day = response.json().get("rates", {})
+                for quote, s in series.items():
+                    # Today's rate may not be published yet, so today stays open for the next call
+                    s.merge({_day(d): rates[quote] for d, rates in by_day.items() if quote in rates},
+                            gap_first, min(gap_last, today - 1))
+                if gap_last == today:
+                    for quote in quotes:
+                        self._today_checked[base, quote, today] = now
+            if gaps:
+                for quote, s in series.items():
+                    s.save(self._path(base, quote))
+
+    def as_of(self, base, quote, date, lookback=10):
+        """(date, rate) of the last published rate on or before date, or None."""
+        day = _day(date)
+        series = self._get(base, quote)
+        if series.gaps(day - lookback, day):
+            self.ensure(base, [quote], day - lookback, day)
+            series = self._get(base, quote)
+        i = bisect_right(series.days, day)
+        if not i:
+            return None
+        return datetime.date.fromordinal(series.days[i - 1]), series.rates[i - 1]
+
+    def range(self, base, quote, start, end):
+        self.ensure(base, [quote], start, end)
+        series = self._get(base, quote)
+        lo, hi = bisect_right(series.days, _day(start) - 1), bisect_right(series.days, _day(end))
+        return [(datetime.date.fromordinal(d), r) for d, r in zip(series.days[lo:hi], series.rates[lo:hi])]
+
+
+def _day(value):
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str):
+        value = datetime.date.fromisoformat(value)
+    return value.toordinal()
+
+
+_default_provider = None
+
+
+def get_exchange_rates(base, targets):
+    global _default_provider
+    if _default_provider is None:
+        _default_provider = RateProvider()
+    return _default_provider.rates(base, targets)
+
+
+def benchmark(conversions=200_000):
+    import random
+    from stub_servers import serve_frankfurter
+    server = serve_frankfurter()
+    codes = ["EUR", "USD", "GBP", "INR", "JPY", "CHF", "AUD", "CAD"]
+    pairs = [(random.choice(codes), random.choice(codes)) for _ in range(conversions)]
+
+    start = time.perf_counter()
+    for base, target in pairs[:200]:
+        requests.get(f"{server.url}/latest?from={base}&to={target}").json()
+    naive = 200 / (time.perf_counter() - start)
+
+    provider = RateProvider(server.url)
+    hits = server.hits
+    start = time.perf_counter()
+    for base, target in pairs:
+        provider.convert(100.0, base, target)
+    cached = conversions / (time.perf_counter() - start)
+    print(f"request per conversion: {naive:10,.0f} conversions/s")
+    print(f"pooled + cached:        {cached:10,.0f} conversions/s ({server.hits - hits} requests to the stub)")
+    server.shutdown()
+
+
+def check():
+    """Exercise the rate cache against the local stub server and print what each step showed."""
+    import tempfile
+    from stub_servers import serve_frankfurter
+    server = serve_frankfurter()
+    with tempfile.TemporaryDirectory() as directory:
+        cache_path = os.path.join(directory, "rates.json")
+        provider = RateProvider(server.url, ttl=60, cache_path=cache_path, autosave=False)
+        provider.convert(100.0, "USD", "GBP")
+        provider.convert(100.0, "GBP", "JPY")
+        assert server.hits == 1
+        print("every pair is a cross rate of one pivot table: 2 conversions, 1 request")
+
+        with provider._lock:
+            provider._cache = {k: (v[0] - 61, v[1]) for k, v in provider._cache.items()}
+        provider.convert(100.0, "USD", "GBP")
+        assert server.hits == 2
+        print("the latest table is fetched again once ttl has passed")
+
+        provider.table("2024-03-01")
+        with provider._lock:
+            provider._cache = {k: (v[0] - 61, v[1]) for k, v in provider._cache.items()}
+        provider.table("2024-03-01")
+        assert server.hits == 3
+        print("a historical table is kept past ttl")
+
+        assert not os.path.exists(cache_path)
+        provider.save()
+        reloaded = RateProvider(server.url, ttl=60, cache_path=cache_path)
+        assert reloaded.table("2024-03-01") == provider.table("2024-03-01") and server.hits == 3
+        print("with autosave off the cache reaches cache_path on save(), and a new provider starts from it")
+    server.shutdown()
+
+
+def benchmark_history(lookups=100_000):
+    import random
+    import tempfile
+    from stub_servers import serve_frankfurter
+    server = serve_frankfurter()
+    quotes = ["USD", "GBP", "INR", "JPY"]
+    with tempfile.TemporaryDirectory() as directory:
+        history = RateHistory(directory, RateProvider(server.url))
+        start = time.perf_counter()
+        history.ensure("EUR", quotes, "2015-01-01", "2024-12-31")
+        history.ensure("EUR", quotes, "2014-01-01", "2025-01-31")
+        print(f"10 years x {len(quotes)} pairs in {server.hits} range requests, {time.perf_counter() - start:.2f}s")
+
+        days = [datetime.date(2015, 1, 1) + datetime.timedelta(days=random.randrange(3650)) for _ in range(lookups)]
+        start = time.perf_counter()
+        for day in days:
+            history.as_of("EUR", random.choice(quotes), day)
+        elapsed = time.perf_counter() - start
+        print(f"as-of lookup: {elapsed / lookups * 1e6:.1f} us ({server.hits} requests in total)")
+    server.shutdown()
+
+
+def check_history():
+    """Exercise RateHistory's gap filling and today TTL against the local stub server."""
+    import tempfile
+    from stub_servers import serve_frankfurter
+    server = serve_frankfurter()
+    with tempfile.TemporaryDirectory() as directory:
+        history = RateHistory(directory, RateProvider(server.url))
+        history.ensure("EUR", ["USD", "GBP"], "2024-01-01", "2024-03-31")
+        history.ensure("EUR", ["USD", "GBP"], "2024-02-01", "2024-02-29")
+        assert server.hits == 1
+        print("a range inside one already fetched makes no request")
+        history.ensure("EUR", ["USD", "GBP"], "2023-12-01", "2024-04-30")
+        assert server.hits == 3
+        print("a wider range only fetches its two missing ends")
+
+        today = datetime.date.today()
+        history.ensure("EUR", ["USD"], today - datetime.timedelta(days=7), today)
+        hits = server.hits
+        history.ensure("EUR", ["USD"], today - datetime.timedelta(days=7), today)
+        assert server.hits == hits
+        print(f"today is not asked for again within today_ttl ({history.today_ttl}s)")
+        key = ("EUR", "USD", today.toordinal())
+        history._today_checked[key] -= history.today_ttl + 1
+        history.ensure("EUR", ["USD"], today - datetime.timedelta(days=7), today)
+        assert server.hits == hits + 1
+        print("after today_ttl only today is fetched again")
+
+        reopened = RateHistory(directory, RateProvider(server.url))
+        hits = server.hits
+        assert reopened.as_of("EUR", "GBP", "2024-03-02") == history.as_of("EUR", "GBP", "2024-03-02")
+        assert server.hits == hits
+        print("a new RateHistory answers as-of lookups from the files without a request")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["bench"]:
+        benchmark()
+        sys.exit()
+    if sys.argv[1:2] == ["check"]:
+        check()
+        sys.exit()
+    if sys.argv[1:2] == ["history-check"]:
+        check_history()
+        sys.exit()
+    if sys.argv[1:2] == ["history-bench"]:
+        benchmark_history()
+        sys.exit()
+
+    # List of supported currencies
+    currencies = ["INR", "USD", "GBP", "EUR", "SAR"]
+
+    print("Available currencies:", ", ".join(currencies))
+    base_currency = input("Choose base currency (e.g., USD): ").upper()
+
+    if base_currency not in currencies:
+        print("Invalid currency! Please choose from the list.")
+    else:
+        try:
+            amount = float(input(f"Enter amount in {base_currency}: "))
+        except ValueError:
+            print("Invalid amount entered!")
+            exit()
+
+        targets = [c for c in currencies if c != base_currency]
+        rates = get_exchange_rates(base_currency, targets)
+
+        print(f"\nExchange Rates for {amount} {base_currency}:\n")
+        for target, rate in rates.items():
+            converted = amount * rate
+            print(f"{amount} {base_currency} = {converted:.2f} {target}")
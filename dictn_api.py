@@ -1,23 +1,373 @@
-import requests
-
-def get_meaning(word):
-    url = f"https://api.dictionaryapi.dev/api/v2/entries/en/{word}"
-    try:
-        response = requests.get(url, timeout=5)  # wait max 5 seconds
-        response.raise_for_status()
-        
-        data = response.json()
-        meaning = data[0]["meanings"][0]   # just take first meaning
-        part_of_speech = meaning["partOfSpeech"]
-        definition = meaning["definitions"][0]["definition"]
-
-        print(f"\n{word.capitalize()} ({part_of_speech}): {definition}")
-
-    except requests.exceptions.Timeout:
-        print("⏳ The request took too long. Try again later.")
-    except requests.exceptions.RequestException:
-        print(f"❌ Word '{word}' not found.")
-
-# Example usage
-word = input("Enter the word correctly to search its meaning: ")
-get_meaning(word)
\ No newline at end of file
+import argparse
+import asyncio
+import json
+import mmap
+import os
+import random
+import sqlite3
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+
+API_URL = os.environ.get("DICTIONARY_API_URL", "https://api.dictionaryapi.dev/api/v2/entries/en")
+# A word the API doesn't know is remembered for this long before it is asked again
+NOT_FOUND_TTL = 7 * 24 * 3600
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (word TEXT PRIMARY KEY, status INTEGER, body TEXT, fetched_at REAL);
+"""
+
+
+class DictionaryCache:
+    """Full API responses by word in SQLite, including 404s (negative caching)."""
+
+    def __init__(self, path="dictionary_cache.sqlite3"):
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(CACHE_SCHEMA)
+        self._lock = threading.Lock()
+
+    def get(self, word):
+        """Return (status, entries) from the cache, or None when the word has to be fetched."""
+        with self._lock:
+            row = self.db.execute("SELECT status, body, fetched_at FROM entries WHERE word = ?", (word,)).fetchone()
+        if row is None:
+            return None
+        status, body, fetched_at = row
+        if status == 404 and time.time() - fetched_at > NOT_FOUND_TTL:
+            return None
+        return status, json.loads(body) if body else None
+
+    def put(self, word, status, entries):
+        with self._lock, self.db:
+            self.db.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)",
+                            (word, status, json.dumps(entries) if entries is not None else None, time.time()))
+
+    def close(self):
+        self.db.close()
+
+
+INDEX_MAGIC = b"DICTIDX1"
+INDEX_HEADER = struct.Struct("<8sQ")
+
+
+def normalize_entry(record):
+    """Turn one dump record into the API's entry shape, or None if it has no definitions.
+
+    Accepts API-style entries ({"word", "meanings": [...]}) as they are, and
+    wiktextract/kaikki lines ({"word", "pos", "senses": [{"glosses": [...]}]}).
+    """
+    if "meanings" in record:
+        return record if record.get("word") else None
+    definitions = [{"definition": "; ".join(sense["glosses"]), "synonyms": []}
+                   for sense in record.get("senses", ()) if sense.get("glosses")]
+    if not record.get("word") or not definitions:
+        return None
+    return {"word": record["word"], "phonetics": [],
+            "meanings": [{"partOfSpeech": record.get("pos", ""), "definitions": definitions}]}
+
+
+def build_index(dump, index_path):
+    """Build index_path.keys and index_path.data from a JSONL dictionary dump.
+
+    Entries are first appended to a scratch file in dump order; then every
+    word's entries are copied together, in sorted word order, into the data
+    file as one JSON array. Only (word, offset, length) triples are held in
+    memory, so dumps far larger than RAM can be indexed.
+    """
+    spans = {}
+    scratch = index_path + ".scratch"
+    with open(dump, encoding="utf-8") as source, open(scratch, "wb") as out:
+        for line in source:
+            line = line.strip()
+            if not line:
+                continue
+            entry = normalize_entry(json.loads(line))
+            if entry is None:
+                continue
+            blob = json.dumps(entry, ensure_ascii=False, separators=(",", ":")).encode()
+            spans.setdefault(entry["word"].lower().encode(), []).append((out.tell(), len(blob)))
+            out.write(blob)
+
+    keys = sorted(spans)
+    key_offsets, data_offsets = [0], [0]
+    with open(scratch, "rb") as source, open(index_path + ".data", "wb") as data:
+        for key in keys:
+            data.write(b"[" + b",".join(_read_at(source, offset, length) for offset, length in spans[key]) + b"]")
+            key_offsets.append(key_offsets[-1] + len(key))
+            data_offsets.append(data.tell())
+    with open(index_path + ".keys", "wb") as file:
+        file.write(INDEX_HEADER.pack(INDEX_MAGIC, len(keys)))
+        file.write(struct.pack(f"<{len(keys) + 1}Q", *key_offsets))
+        file.write(struct.pack(f"<{len(keys) + 1}Q", *data_offsets))
+        file.write(b"".join(keys))
+    os.remove(scratch)
+    return len(keys)
+
+
+def _read_at(file, offset, length):
+    file.seek(offset)
+    return file.read(length)
+
+
+class OfflineDictionary:
+    """Read-only dictionary over a sorted key file and a memory-mapped data file.
+
+    A lookup is a binary search over the keys followed by one JSON decode of
+    that word's entries, so it costs microseconds and never touches the
+    network.
+    """
+
+    def __init__(self, index_path):
+        with open(index_path + ".keys", "rb") as file:
+            self._keys = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        with open(index_path + ".data", "rb") as file:
+            self._data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._count = INDEX_HEADER.unpack_from(self._keys)
+        if magic != INDEX_MAGIC:
+            raise ValueError(f"{index_path}.keys is not a dictionary index")
+        start = INDEX_HEADER.size
+        table = 8 * (self._count + 1)
+        self._key_offsets = memoryview(self._keys)[start:start + table].cast("Q")
+        self._data_offsets = memoryview(self._keys)[start + table:start + 2 * table].cast("Q")
+        self._key_base = start + 2 * table
+
+    def __len__(self):
+        return self._count
+
+    def _key(self, i):
+        return self._keys[self._key_base + self._key_offsets[i]:self._key_base + self._key_offsets[i + 1]]
+
+    def lookup(self, word):
+        """All entries for word in the API's JSON shape, or None when the index doesn't have it."""
+        key = word.strip().lower().encode()
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == self._count or self._key(lo) != key:
+            return None
+        return json.loads(self._data[self._data_offsets[lo]:self._data_offsets[lo + 1]])
+
+    def close(self):
+        self._key_offsets.release()
+        self._data_offsets.release()
+        self._keys.close()
+        self._data.close()
+
+
+class LookupEngine:
+    """Concurrent dictionary lookups for asyncio code.
+
+    An offline index, when given, answers first and the API is only asked
+    about words it doesn't have. Requests run on a thread pool over one
+    pooled requests Session, at most concurrency at a time. Answers (found
+    or 404) are cached, and rate limits, server errors and dropped
+    connections are retried with exponential backoff and jitter.
+    """
+
+    def __init__(self, cache=None, base_url=API_URL, concurrency=8, retries=4, backoff=0.5, timeout=5,
+                 offline=None):
+        self.cache = cache
+        self.offline = offline
+        self.base_url = base_url.rstrip("/")
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.stats = {"offline": 0, "cached": 0, "fetched": 0, "retries": 0}
+        # Own pool: asyncio's default executor can have fewer threads than concurrency
+        self._pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="dictionary")
+        self._semaphore = None
+
+    def _fetch(self, word):
+        # Runs on a worker thread; returns (status, entries) with status 200 or 404
+        for attempt in range(self.retries + 1):
+            delay = 0
+            try:
+                response = self.session.get(f"{self.base_url}/{requests.utils.quote(word)}", timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.retries:
+                    raise
+            else:
+                if response.status_code == 404:
+                    return 404, None
+                if response.status_code not in RETRY_STATUS or attempt == self.retries:
+                    response.raise_for_status()
+                    return 200, response.json()
+                delay = _retry_after(response.headers.get("Retry-After"))
+            self.stats["retries"] += 1
+            time.sleep(max(delay, self.backoff * 2 ** attempt * random.uniform(0.5, 1.5)))
+
+    async def lookup(self, word):
+        """Return (status, entries) for word: 200 with the API's JSON list, or 404 with None."""
+        word = word.strip().lower()
+        entries = self.offline.lookup(word) if self.offline else None
+        if entries is not None:
+            self.stats["offline"] += 1
+            return 200, entries
+        cached = self.cache.get(word) if self.cache else None
+        if cached is not None:
+            self.stats["cached"] += 1
+            return cached
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        async with self._semaphore:
+            status, entries = await asyncio.get_running_loop().run_in_executor(self._pool, self._fetch, word)
+        self.stats["fetched"] += 1
+        if self.cache:
+            self.cache.put(word, status, entries)
+        return status, entries
+
+    async def lookup_many(self, words):
+        """Look words up concurrently; returns {word: (status, entries)}, or an exception for failures."""
+        words = list(dict.fromkeys(w.strip().lower() for w in words if w.strip()))
+        results = await asyncio.gather(*(self.lookup(w) for w in words), return_exceptions=True)
+        return dict(zip(words, results))
+
+    def close(self):
+        self._pool.shutdown()
+        self.session.close()
+
+
+def _retry_after(value):
+    try:
+        return min(float(value), 60.0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def all_senses(entries):
+    """Every (part of speech, definition) pair across a word's entries."""
+    return [(meaning["partOfSpeech"], definition["definition"])
+            for entry in entries for meaning in entry["meanings"] for definition in meaning["definitions"]]
+
+
+def get_meaning(word, offline=None, base_url=API_URL):
+    entries = offline.lookup(word) if offline else None
+    if entries is not None:
+        print(f"\n{word.capitalize()}:")
+        for part_of_speech, definition in all_senses(entries):
+            print(f"  ({part_of_speech}) {definition}")
+        return
+    url = f"{base_url.rstrip('/')}/{word}"
+    try:
+        response = requests.get(url, timeout=5)  # wait max 5 seconds
+        response.raise_for_status()
+
+        data = response.json()
+        print(f"\n{word.capitalize()}:")
+        for part_of_speech, definition in all_senses(data):
+            print(f"  ({part_of_speech}) {definition}")
+
+    except requests.exceptions.Timeout:
+        print("⏳ The request took too long. Try again later.")
+    except requests.exceptions.RequestException:
+        print(f"❌ Word '{word}' not found.")
+
+
+def batch(path, db, base_url=API_URL, concurrency=8, offline=None):
+    with open(path, encoding="utf-8") as file:
+        words = [line.strip() for line in file if line.strip()]
+    cache = DictionaryCache(db)
+    engine = LookupEngine(cache, base_url, concurrency, offline=offline)
+    start = time.perf_counter()
+    results = asyncio.run(engine.lookup_many(words))
+    elapsed = time.perf_counter() - start
+    found = sum(1 for r in results.values() if not isinstance(r, Exception) and r[0] == 200)
+    errors = sum(1 for r in results.values() if isinstance(r, Exception))
+    print(f"{len(results):,} words in {elapsed:.2f}s ({len(results) / max(elapsed, 1e-9):,.0f} words/s): "
+          f"{found:,} found, {len(results) - found - errors:,} not found, {errors:,} failed")
+    print(f"{engine.stats['offline']:,} offline, {engine.stats['cached']:,} from cache, "
+          f"{engine.stats['fetched']:,} fetched, "
+          f"{engine.stats['retries']:,} retries")
+    engine.close()
+    cache.close()
+    return results
+
+
+def check():
+    """Exercise the cache and retry paths against the local stub server and print what each showed."""
+    import tempfile
+    from stub_servers import serve_dictionary
+    with tempfile.TemporaryDirectory() as directory:
+        server = serve_dictionary(["apple"])
+        cache = DictionaryCache(os.path.join(directory, "cache.sqlite3"))
+        engine = LookupEngine(cache, server.url, backoff=0.01)
+        assert asyncio.run(engine.lookup("nosuchword")) == (404, None)
+        assert asyncio.run(engine.lookup("nosuchword")) == (404, None) and server.hits == 1
+        print("404s are cached: a second lookup made no request")
+
+        with cache._lock, cache.db:
+            cache.db.execute("UPDATE entries SET fetched_at = ? WHERE word = 'nosuchword'",
+                             (time.time() - NOT_FOUND_TTL - 1,))
+        asyncio.run(engine.lookup("nosuchword"))
+        assert server.hits == 2
+        print(f"a 404 older than NOT_FOUND_TTL ({NOT_FOUND_TTL}s) is fetched again")
+        engine.close()
+        server.shutdown()
+
+        # Every second request is a 503 asking the client to wait a second
+        server = serve_dictionary(["apple", "pear"], fail_every=2, retry_after=1)
+        engine = LookupEngine(cache, server.url, backoff=0.01)
+        asyncio.run(engine.lookup("apple"))
+        start = time.perf_counter()
+        status, _ = asyncio.run(engine.lookup("pear"))
+        waited = time.perf_counter() - start
+        assert status == 200 and engine.stats["retries"] == 1 and waited >= 1
+        print(f"a 503 with Retry-After: 1 was retried once after {waited:.2f}s")
+        engine.close()
+        server.shutdown()
+
+        server = serve_dictionary(["apple"], fail_every=1)
+        engine = LookupEngine(cache, server.url, retries=2, backoff=0.01)
+        try:
+            asyncio.run(engine.lookup("plum"))
+        except requests.HTTPError as error:
+            assert error.response.status_code == 503
+        else:
+            raise AssertionError("the last attempt's 503 should raise")
+        assert server.hits == 3 and cache.get("plum") is None
+        print("after retries=2 the third 503 raised HTTPError and nothing was cached")
+        engine.close()
+        server.shutdown()
+        cache.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Look up word meanings.")
+    parser.add_argument("words", nargs="?", help="file with one word per line for a batch lookup")
+    parser.add_argument("--db", default="dictionary_cache.sqlite3", help="cache database")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--api", default=API_URL)
+    parser.add_argument("--index", help="offline index to answer from before asking the API")
+    parser.add_argument("--build-index", metavar="DUMP", help="build --index from a JSONL dictionary dump and exit")
+    parser.add_argument("--check", action="store_true", help="run the caching and retry checks against a local stub")
+    args = parser.parse_args()
+
+    if args.check:
+        check()
+    elif args.build_index:
+        start = time.perf_counter()
+        count = build_index(args.build_index, args.index or "dictionary")
+        print(f"indexed {count:,} words in {time.perf_counter() - start:.1f}s")
+    else:
+        offline = OfflineDictionary(args.index) if args.index else None
+        if args.words:
+            batch(args.words, args.db, args.api, args.concurrency, offline)
+        else:
+            # Example usage
+            word = input("Enter the word correctly to search its meaning: ")
+            get_meaning(word, offline, args.api)
@@ -0,0 +1,142 @@
+import argparse
+import datetime
+import os
+import time
+import numpy as np
+import pandas as pd
+import requests
+from currency_exchange import API_URL, RateProvider
+
+# Digits after the decimal point in each currency's minor unit (ISO 4217);
+# anything not listed uses 2
+MINOR_UNITS = {"JPY": 0, "KRW": 0, "ISK": 0, "CLP": 0, "VND": 0, "HUF": 2, "BHD": 3, "KWD": 3, "OMR": 3}
+
+
+def round_half_up(values, digits):
+    """Round to digits decimals, halves away from zero, without binary-float tie errors.
+
+    The first rounding to 6 extra places snaps products like 267.49999999997
+    back to the decimal tie they represent before the half-up step.
+    """
+    scale = 10.0 ** digits
+    scaled = np.round(values * scale, 6)
+    return np.sign(scaled) * np.floor(np.abs(scaled) + 0.5) / scale
+
+
+class LedgerConverter:
+    """Converts (amount, currency, date) rows to one currency, a chunk at a time.
+
+    Each date's pivot table is fetched once and kept as a dense row of rates
+    over every known currency, so a chunk converts with two fancy-indexed
+    lookups into a (dates x currencies) matrix instead of a Python loop. A
+    date that isn't YYYY-MM-DD, or that the API has no table for, gets an
+    all-NaN row, so its rows come back unconverted instead of ending the run.
+    """
+
+    def __init__(self, target, provider=None):
+        self.target = target
+        self.provider = provider or RateProvider()
+        self.codes = {}
+        self._rows = {}
+
+    def _row(self, date):
+        row = self._rows.get(date)
+        if row is None:
+            table = self._table(date)
+            for code in table:
+                self.codes.setdefault(code, len(self.codes))
+            row = np.full(len(self.codes), np.nan)
+            for code, rate in table.items():
+                row[self.codes[code]] = rate
+            self._rows[date] = row
+        return row
+
+    def _table(self, date):
+        day = str(date)
+        try:
+            if datetime.date.fromisoformat(day).isoformat() != day:
+                return {}
+        except ValueError:
+            return {}
+        try:
+            return self.provider.table(day)
+        except requests.HTTPError as error:
+            # 4xx means the API has no table for that date; anything else is
+            # an outage, and the run shouldn't carry on writing NaN for it
+            if error.response is not None and 400 <= error.response.status_code < 500:
+                return {}
+            raise
+
+    def rate_matrix(self, dates):
+        rows = [self._row(d) for d in dates]
+        matrix = np.full((len(rows), len(self.codes)), np.nan)
+        for i, row in enumerate(rows):
+            matrix[i, :len(row)] = row
+        return matrix
+
+    def convert(self, amounts, currencies, dates):
+        """Return (converted, rate) arrays; rows with an unknown or blank currency or date come back as NaN."""
+        # factorize hashes instead of sorting, and the chunk only has a few distinct keys
+        day_idx, day_keys = pd.factorize(np.asarray(dates, dtype=object))
+        code_idx, code_keys = pd.factorize(np.asarray(currencies, dtype=object))
+        matrix = self.rate_matrix(day_keys)
+        # factorize gives blanks (NaN/None) the code -1, so the last row and
+        # column are all-NaN and a blank date or currency indexes into them
+        missing = len(self.codes)
+        columns = np.array([self.codes.get(c, missing) for c in code_keys] + [missing])
+        matrix = np.pad(matrix, ((0, 1), (0, 1)), constant_values=np.nan)
+        if self.codes and self.target not in self.codes:
+            raise KeyError(f"no rates for {self.target}")
+        rate = matrix[day_idx, self.codes.get(self.target, missing)] / matrix[day_idx, columns[code_idx]]
+        converted = round_half_up(np.asarray(amounts, dtype=float) * rate, MINOR_UNITS.get(self.target, 2))
+        return converted, rate
+
+
+def read_chunks(path, chunk_size):
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size,
+                                                      columns=["amount", "currency", "date"]):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size, dtype={"currency": str, "date": str})
+
+
+def convert_ledger(path, out, target, provider=None, chunk_size=500_000):
+    """Stream path through the converter into out (CSV); returns (rows, rows without a rate)."""
+    converter = LedgerConverter(target, provider)
+    rows = unknown = 0
+    for i, chunk in enumerate(read_chunks(path, chunk_size)):
+        converted, rate = converter.convert(chunk["amount"].to_numpy(), chunk["currency"].to_numpy(),
+                                            chunk["date"].to_numpy())
+        chunk[f"amount_{target}"] = converted
+        chunk["rate"] = rate
+        chunk.to_csv(out, mode="w" if i == 0 else "a", header=i == 0, index=False)
+        converter.provider.save()
+        rows += len(chunk)
+        unknown += int(np.isnan(rate).sum())
+    return rows, unknown
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert a ledger of (amount, currency, date) rows to one currency.")
+    parser.add_argument("ledger", help="CSV or Parquet with amount, currency and date (YYYY-MM-DD) columns")
+    parser.add_argument("--to", default="EUR", help="currency to convert into")
+    parser.add_argument("--out", default=None, help="output CSV (default: <ledger>_<to>.csv)")
+    parser.add_argument("--chunk-size", type=int, default=500_000, help="rows held in memory at once")
+    parser.add_argument("--api", default=API_URL, help="Frankfurter base URL")
+    parser.add_argument("--cache", default=None, help="JSON file to keep fetched rates in between runs")
+    args = parser.parse_args()
+
+    out = args.out or f"{os.path.splitext(args.ledger)[0]}_{args.to}.csv"
+    start = time.perf_counter()
+    provider = RateProvider(args.api, cache_path=args.cache, autosave=False)
+    rows, unknown = convert_ledger(args.ledger, out, args.to.upper(), provider, args.chunk_size)
+    elapsed = time.perf_counter() - start
+    print(f"{rows:,} rows converted in {elapsed:.2f}s ({rows / max(elapsed, 1e-9):,.0f} rows/s) -> {out}")
+    if unknown:
+        print(f"{unknown:,} rows had a currency or date with no rate")
+
+
+if __name__ == "__main__":
+    main()
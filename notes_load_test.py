@@ -0,0 +1,124 @@
+import argparse
+import http.client
+import json
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import notes_web_app
+
+
+class LegacyHandler(BaseHTTPRequestHandler):
+    # The original single-threaded handler: encodes the page on every GET, no caching headers
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-type', 'text/html; charset=utf-8')
+        self.end_headers()
+        self.wfile.write(notes_web_app.index_html.encode('utf-8'))
+
+
+def load_test(host, port, path='/', requests=5000, concurrency=32, headers=None):
+    latencies = []
+    lock = threading.Lock()
+    per_worker = requests // concurrency
+
+    def worker():
+        conn = http.client.HTTPConnection(host, port, timeout=30)
+        mine = []
+        for _ in range(per_worker):
+            start = time.perf_counter()
+            conn.request('GET', path, headers=headers or {})
+            conn.getresponse().read()
+            mine.append(time.perf_counter() - start)
+        conn.close()
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        'rps': len(latencies) / elapsed,
+        'p50': latencies[len(latencies) // 2] * 1000,
+        'p99': latencies[int(len(latencies) * 0.99)] * 1000,
+    }
+
+
+def _serve(server):
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server.server_address[1]
+
+
+def report(label, result):
+    print(f"{label:>28}: {result['rps']:8.0f} req/s  p50 {result['p50']:6.2f} ms  p99 {result['p99']:6.2f} ms")
+
+
+def first_paint(sizes=(100, 1_000, 10_000, 100_000), repeat=50):
+    """Time the request the page makes before it can paint the list, for growing corpora."""
+    print(f"{'notes':>8}  {'first page':>10}  {'page bytes':>10}  {'all notes bytes':>15}")
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as db_dir:
+            server = notes_web_app.make_server('127.0.0.1', 0, db_path=os.path.join(db_dir, 'notes.db'),
+                                               blob_dir=os.path.join(db_dir, 'blobs'))
+            store = server.store
+            for start in range(0, size, 1000):
+                store.apply([{'id': f'note-{i:06d}', 'title': f'Note {i}',
+                              'content': f'<p>Body of note {i} with a few words in it.</p>',
+                              'updated_at': f'2025-01-01T00:00:{i:06d}Z'}
+                             for i in range(start, min(size, start + 1000))])
+            port = _serve(server)
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            timings = []
+            for _ in range(repeat):
+                begin = time.perf_counter()
+                conn.request('GET', '/api/notes?limit=50')
+                body = conn.getresponse().read()
+                timings.append(time.perf_counter() - begin)
+            conn.close()
+            timings.sort()
+            everything = len(json.dumps(store.changes_since(0, limit=size)))
+            print(f"{size:>8,}  {timings[len(timings) // 2] * 1000:>7.2f} ms  {len(body):>10,}  {everything:>15,}")
+            server.shutdown()
+            server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load-test the notes server against the original one.')
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--first-paint', action='store_true',
+                        help='time the first list page for 100 to 100,000 notes instead')
+    args = parser.parse_args()
+    if args.first_paint:
+        first_paint()
+        return
+
+    legacy = HTTPServer(('127.0.0.1', 0), LegacyHandler)
+    legacy.request_queue_size = 128
+    db_dir = tempfile.TemporaryDirectory()
+    current = notes_web_app.make_server('127.0.0.1', 0, db_path=os.path.join(db_dir.name, 'notes.db'),
+                                         blob_dir=os.path.join(db_dir.name, 'blobs'))
+    legacy_port, current_port = _serve(legacy), _serve(current)
+
+    report('legacy HTTPServer', load_test('127.0.0.1', legacy_port, requests=args.requests, concurrency=args.concurrency))
+    report('threaded, gzip', load_test('127.0.0.1', current_port, requests=args.requests, concurrency=args.concurrency,
+                                       headers={'Accept-Encoding': 'gzip, br'}))
+    report('threaded, If-None-Match 304', load_test('127.0.0.1', current_port, requests=args.requests,
+                                                    concurrency=args.concurrency,
+                                                    headers={'If-None-Match': notes_web_app.index_etag}))
+    legacy.shutdown()
+    current.shutdown()
+    db_dir.cleanup()
+
+
+if __name__ == '__main__':
+    main()
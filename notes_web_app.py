@@ -1,6 +1,23 @@
-from http.server import BaseHTTPRequestHandler, HTTPServer
+from datetime import datetime, timezone
+from html.parser import HTMLParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+import base64
+import gzip
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
 import webbrowser
 
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
 index_html = """<!doctype html>
 <html lang="en">
 <head>
@@ -19,11 +36,11 @@ html,body{height:100%;margin:0;font-family:Inter,system-ui,Arial;background:line
 .layout{display:grid;grid-template-columns:360px 1fr;gap:18px;margin-top:18px}
 .panel{background:var(--card);border-radius:12px;padding:14px;box-shadow:0 6px 18px rgba(2,6,23,0.6)}
 .search{width:100%;padding:10px;border-radius:10px;border:0;background:var(--glass);color:inherit}
-.notes-list{margin-top:12px;display:flex;flex-direction:column;gap:10px;max-height:68vh;overflow:auto;padding-right:6px}
-.note-card{padding:12px;border-radius:10px;background:linear-gradient(180deg, rgba(255,255,255,0.02), rgba(255,255,255,0.01));cursor:pointer;transition:0.2s}
+.notes-list{margin-top:12px;position:relative;height:68vh;overflow:auto;padding-right:6px}
+.note-card{position:absolute;left:0;right:6px;height:102px;box-sizing:border-box;overflow:hidden;padding:12px;border-radius:10px;background:linear-gradient(180deg, rgba(255,255,255,0.02), rgba(255,255,255,0.01));cursor:pointer;transition:0.2s}
 .note-card:hover{background:rgba(124,58,237,0.1)}
 .note-title{font-weight:600}
-.note-snippet{color:var(--muted);font-size:0.85rem;margin-top:6px}
+.note-snippet{color:var(--muted);font-size:0.85rem;margin-top:6px;display:-webkit-box;-webkit-line-clamp:2;-webkit-box-orient:vertical;overflow:hidden}
 .editor{min-height:56vh;display:flex;flex-direction:column}
 .toolbar{display:flex;gap:8px;flex-wrap:wrap;margin-bottom:10px}
 .btn{background:var(--glass);border:0;padding:8px 10px;border-radius:8px;cursor:pointer;color:inherit;transition:0.2s}
@@ -31,11 +48,12 @@ html,body{height:100%;margin:0;font-family:Inter,system-ui,Arial;background:line
 .btn.active{background:rgba(124,58,237,0.25)}
 .btn.primary{background:linear-gradient(90deg,var(--accent),#06b6d4);color:white}
 .title-input{width:100%;padding:10px;border-radius:8px;border:0;background:transparent;color:inherit;font-size:1.05rem;font-weight:600}
+.editable img{max-width:100%}
 .editable{flex:1;padding:12px;border-radius:10px;background:rgba(255,255,255,0.02);overflow:auto}
 .small{font-size:0.85rem;color:var(--muted)}
 .note-meta{display:flex;gap:10px;align-items:center}
 .actions{display:flex;gap:8px}
-@media (max-width:880px){.layout{grid-template-columns:1fr}.notes-list{max-height:26vh}}
+@media (max-width:880px){.layout{grid-template-columns:1fr}.notes-list{height:26vh}}
 </style>
 </head>
 <body>
@@ -44,7 +62,7 @@ html,body{height:100%;margin:0;font-family:Inter,system-ui,Arial;background:line
 <div class="brand"><div class="logo">
   <svg xmlns="http://www.w3.org/2000/svg" fill="white" viewBox="0 0 24 24" width="24" height="24">
     <path d="M19 2H5c-1.1 0-2 .9-2 2v16l4-4h12c1.1 0 2-.9 2-2V4c0-1.1-.9-2-2-2zm0 12H7l-2 2V4h14v10z"/>
-  </svg></div><div><div class="title">PARZi NOTES</div><div class="subtitle">Local-first • Single-file</div></div></div>
+  </svg></div><div><div class="title">PARZi NOTES</div><div class="subtitle">Self-hosted • Single-file</div></div></div>
 <div><button id="new-note-btn" class="btn primary">New Note</button></div>
 </div>
 <div class="layout">
@@ -66,11 +84,12 @@ html,body{height:100%;margin:0;font-family:Inter,system-ui,Arial;background:line
 <div id="editor" class="editable" contenteditable="true" role="textbox" aria-label="Note editor"></div>
 </div>
 </div>
-<div style="text-align:center;margin-top:14px;color:var(--muted);font-size:0.85rem;">Notes live in your browser (localStorage). No account needed.</div>
+<div style="text-align:center;margin-top:14px;color:var(--muted);font-size:0.85rem;">Notes are stored on this server (SQLite). No account needed.</div>
 </div>
 <script>
 (function(){
 const STORAGE_KEY='notes_v2';
+const API='/api/notes';
 const notesListEl=document.getElementById('notes-list');
 const editorEl=document.getElementById('editor');
 const titleEl=document.getElementById('note-title');
@@ -78,20 +97,43 @@ const searchEl=document.getElementById('search');
 const newBtn=document.getElementById('new-note-btn');
 const saveBtn=document.getElementById('save-btn');
 const deleteBtn=document.getElementById('delete-btn');
+const MARK_OPEN=String.fromCharCode(2),MARK_CLOSE=String.fromCharCode(3);
 let notes=[];
 let activeId=null;
-function nowISO(){return new Date().toISOString()}
-function load(){try{const raw=localStorage.getItem(STORAGE_KEY);const parsed=raw?JSON.parse(raw):[];notes=Array.isArray(parsed)?parsed:[]}catch(e){notes=[]}}
-function saveAll(){try{localStorage.setItem(STORAGE_KEY,JSON.stringify(notes))}catch(e){console.error('save failed',e)}}
-function stripHtml(html){const d=document.createElement('div');d.innerHTML=html||'';return d.textContent||d.innerText||''}
-function snippet(html){const txt=stripHtml(html).trim();return txt.length>120?txt.slice(0,120)+'...':(txt||'(empty)')}
-function renderNotesList(filter){if(!notesListEl) return;notesListEl.innerHTML='';const f=String(filter||'').toLowerCase();const sorted=notes.slice().sort((a,b)=>new Date(b.updated_at||b.created_at)-new Date(a.updated_at||a.created_at));const filtered=sorted.filter(n=>((n.title||'').toLowerCase().includes(f))||((stripHtml(n.content)||'').toLowerCase().includes(f)));if(filtered.length===0){notesListEl.innerHTML='<div class="small" style="padding:8px;color:var(--muted)">No saved notes yet</div>';return}for(const n of filtered){const card=document.createElement('div');card.className='note-card';if(n.id===activeId) card.className+=' active-note';card.dataset.id=n.id;const t=document.createElement('div');t.className='note-title';t.innerText=n.title||'Untitled';const s=document.createElement('div');s.className='note-snippet';s.innerText=snippet(n.content);const meta=document.createElement('div');meta.className='small';meta.innerText=new Date(n.updated_at||n.created_at).toLocaleString();card.appendChild(t);card.appendChild(s);card.appendChild(meta);card.addEventListener('click',()=>openNote(n.id));notesListEl.appendChild(card)}}
+let syncSeq=0;
+let dirty={};
+let syncing=null;
+let nextCursor=null;
+let loadingMore=false;
+let searchResults=null;
+let scrollFrame=0;
+const ROW_H=112;
+const channel=window.BroadcastChannel?new BroadcastChannel('parzi-notes'):null;
+function newId(){return 'n_'+Math.random().toString(36).slice(2,9)}
+function api(method,path,body){return fetch(path,{method,headers:body?{'Content-Type':'application/json'}:{},body:body?JSON.stringify(body):undefined}).then(r=>{if(!r.ok) throw new Error(method+' '+path+': '+r.status);return r.status===204?null:r.json()})}
+function noteUrl(id){return API+'/'+encodeURIComponent(id)}
+function load(){return api('GET',API+'?limit=50').then(r=>{notes=r.notes;nextCursor=r.next_cursor;syncSeq=r.seq})}
+function loadMore(){if(!nextCursor||loadingMore) return;loadingMore=true;api('GET',API+'?limit=50&cursor='+encodeURIComponent(nextCursor)).then(r=>{const known=new Set(notes.map(n=>n.id));for(const n of r.notes) if(!known.has(n.id)) notes.push(n);nextCursor=r.next_cursor;loadingMore=false;if(!searchResults) renderWindow()}).catch(e=>{loadingMore=false;console.error('load failed',e)})}
+function uploadBlob(blob){return fetch('/api/blobs',{method:'POST',headers:{'Content-Type':blob.type||'application/octet-stream'},body:blob}).then(r=>{if(!r.ok) throw new Error('upload: '+r.status);return r.json()}).then(r=>r.url)}
+function hoistImages(root){const imgs=[...root.querySelectorAll('img[src^="data:"]:not([data-uploading])')];return Promise.all(imgs.map(img=>(img.dataset.uploading='1',fetch(img.src).then(r=>r.blob()).then(uploadBlob).then(url=>{img.src=url}).finally(()=>{delete img.dataset.uploading}))))}
+function blobContent(html){const t=document.createElement('template');t.innerHTML=html||'';return hoistImages(t.content).then(()=>t.innerHTML)}
+function insertFiles(files){for(const f of files){uploadBlob(f).then(url=>{if(f.type.startsWith('image/')){format('insertImage',url);return}const a=document.createElement('a');a.href=url;a.textContent=f.name||'attachment';a.target='_blank';format('insertHTML',a.outerHTML)}).catch(e=>{console.error('upload failed',e);flash('Upload failed')})}}
+function migrateLocal(){let local=[];try{local=JSON.parse(localStorage.getItem(STORAGE_KEY)||'[]')}catch(e){local=[]}if(notes.length||!Array.isArray(local)||!local.length) return Promise.resolve();return Promise.all(local.map(n=>blobContent(n.content).then(content=>api('PUT',noteUrl(n.id),Object.assign({},n,{content}))))).then(load)}
+function snippetHtml(s){const d=document.createElement('div');d.textContent=s||'(empty)';return d.innerHTML.split(MARK_OPEN).join('<mark>').split(MARK_CLOSE).join('</mark>')}
+function noteCard(n){const card=document.createElement('div');card.className='note-card';card.dataset.id=n.id;const t=document.createElement('div');t.className='note-title';t.innerText=n.title||'Untitled';const s=document.createElement('div');s.className='note-snippet';s.innerHTML=snippetHtml(n.snippet);const meta=document.createElement('div');meta.className='small';meta.innerText=new Date(n.updated_at||n.created_at).toLocaleString();card.appendChild(t);card.appendChild(s);card.appendChild(meta);card.addEventListener('click',()=>openNote(n.id));return card}
+function renderNotesList(list){searchResults=list||null;renderWindow()}
+function renderWindow(){if(!notesListEl) return;const list=searchResults||notes;if(list.length===0){notesListEl.innerHTML='<div class="small" style="padding:8px;color:var(--muted)">'+(searchResults?'No matching notes':'No saved notes yet')+'</div>';return}const top=notesListEl.scrollTop,height=notesListEl.clientHeight||600;const first=Math.max(0,Math.floor(top/ROW_H)-5),last=Math.min(list.length,Math.ceil((top+height)/ROW_H)+5);const frag=document.createDocumentFragment();const spacer=document.createElement('div');spacer.style.height=(list.length*ROW_H)+'px';frag.appendChild(spacer);for(let i=first;i<last;i++){const card=noteCard(list[i]);card.style.top=(i*ROW_H)+'px';frag.appendChild(card)}notesListEl.replaceChildren(frag);highlightActive();if(!searchResults&&last>=list.length-10) loadMore()}
+function search(q){q=String(q||'').trim();if(!q){renderNotesList();return}api('GET',API+'?q='+encodeURIComponent(q)+'&limit=50').then(r=>{if(searchEl&&searchEl.value.trim()===q) renderNotesList(r.notes)}).catch(e=>console.error('search failed',e))}
+function refreshList(){search(searchEl?searchEl.value:'')}
 function highlightActive(){const cards=document.querySelectorAll('.note-card');cards.forEach(c=>{c.style.outline=(c.dataset.id===activeId)?'2px solid rgba(124,58,237,0.18)':'none'})}
-function createNoteWithContent(title,content){const id='n_'+Math.random().toString(36).slice(2,9);const now=nowISO();const n={id,title:title||'',content:content||'',created_at:now,updated_at:now};notes.push(n);saveAll();renderNotesList(searchEl?searchEl.value.toLowerCase():'');openNote(id);return n}
-function newNote(){createNoteWithContent('','');if(titleEl) titleEl.focus()}
-function openNote(id){const n=notes.find(x=>x.id===id);if(!n) return;activeId=id;if(titleEl) titleEl.value=n.title||'';if(editorEl) editorEl.innerHTML=n.content||'';highlightActive()}
-function saveNote(){const title=(titleEl&&titleEl.value!==undefined)?titleEl.value.trim():'';const content=(editorEl&&editorEl.innerHTML!==undefined)?editorEl.innerHTML:'';if(!activeId){const created=createNoteWithContent(title,content);created.title=title;created.content=content;created.updated_at=nowISO();saveAll();renderNotesList(searchEl?searchEl.value.toLowerCase():'');activeId=created.id;flash('Saved');return}const n=notes.find(x=>x.id===activeId);if(!n){const created=createNoteWithContent(title,content);created.updated_at=nowISO();saveAll();renderNotesList(searchEl?searchEl.value.toLowerCase():'');activeId=created.id;flash('Saved');return}n.title=title;n.content=content;n.updated_at=nowISO();saveAll();renderNotesList(searchEl?searchEl.value.toLowerCase():'');flash('Saved')}
-function deleteNote(){if(!activeId) return;const ok=confirm('Delete this note?');if(!ok) return;notes=notes.filter(x=>x.id!==activeId);saveAll();activeId=null;if(titleEl) titleEl.value='';if(editorEl) editorEl.innerHTML='';renderNotesList(searchEl?searchEl.value.toLowerCase():'');flash('Deleted')}
+function upsertSummary(n){notes=notes.filter(x=>x.id!==n.id);let i=0;while(i<notes.length&&notes[i].updated_at>n.updated_at) i++;notes.splice(i,0,{id:n.id,title:n.title,snippet:n.snippet,created_at:n.created_at,updated_at:n.updated_at,seq:n.seq})}
+function applyRemote(changes){for(const n of changes){if(n.deleted){notes=notes.filter(x=>x.id!==n.id);if(n.id===activeId&&!dirty[n.id]){activeId=null;if(titleEl) titleEl.value='';if(editorEl) editorEl.innerHTML=''}continue}upsertSummary(n);if(n.id===activeId&&!dirty[n.id]){if(titleEl&&titleEl.value.trim()!==n.title) titleEl.value=n.title;if(editorEl&&n.content!==undefined&&editorEl.innerHTML!==n.content) editorEl.innerHTML=n.content}}if(changes.length) refreshList()}
+function sync(){if(syncing) return syncing.catch(()=>{}).then(sync);const changes=Object.values(dirty);dirty={};syncing=api('POST','/api/sync',{since:syncSeq,changes}).then(r=>{syncSeq=r.seq;syncing=null;applyRemote(r.changes);if(changes.length&&channel) channel.postMessage('changed');if(r.more) return sync()}).catch(e=>{for(const c of changes) dirty[c.id]=Object.assign(c,dirty[c.id]||{});syncing=null;throw e});return syncing}
+function markDirty(field){if(!activeId) activeId=newId();const d=dirty[activeId]||(dirty[activeId]={id:activeId});if(field!=='content') d.title=titleEl?titleEl.value.trim():'';if(field!=='title') d.content=editorEl?editorEl.innerHTML:''}
+function newNote(){activeId=newId();if(titleEl) titleEl.value='';if(editorEl) editorEl.innerHTML='';markDirty();sync().catch(e=>console.error('sync failed',e));if(titleEl) titleEl.focus()}
+function openNote(id){if(saveTimer){clearTimeout(saveTimer);saveTimer=null;sync().catch(e=>console.error('sync failed',e))}return api('GET',noteUrl(id)).then(n=>{activeId=n.id;if(titleEl) titleEl.value=n.title||'';if(editorEl) editorEl.innerHTML=n.content||'';highlightActive()}).catch(e=>console.error('open failed',e))}
+function saveNote(){if(saveTimer){clearTimeout(saveTimer);saveTimer=null}markDirty();return sync().then(()=>flash('Saved')).catch(e=>{console.error('save failed',e);flash('Save failed')})}
+function deleteNote(){if(!activeId) return;const ok=confirm('Delete this note?');if(!ok) return;const id=activeId;dirty[id]={id,deleted:true};notes=notes.filter(x=>x.id!==id);activeId=null;if(titleEl) titleEl.value='';if(editorEl) editorEl.innerHTML='';refreshList();sync().then(()=>flash('Deleted')).catch(e=>console.error('delete failed',e))}
 function flash(msg){const el=document.createElement('div');el.innerText=msg;el.style.position='fixed';el.style.right='18px';el.style.bottom='18px';el.style.padding='10px 12px';el.style.borderRadius='8px';el.style.background='rgba(0,0,0,0.6)';el.style.color='white';el.style.zIndex='9999';document.body.appendChild(el);setTimeout(()=>{el.style.transition='opacity 300ms';el.style.opacity='0'},1200);setTimeout(()=>el.remove(),1600)}
 function format(cmd,val){try{document.execCommand(cmd,false,val)}catch(e){console.warn('format failed',e)}if(editorEl) editorEl.focus()}
 function insertLink(){const url=prompt('Enter a URL (include https://)');if(!url) return;format('createLink',url)}
@@ -108,36 +150,576 @@ const fu=document.getElementById('fmt-ul');if(fu) fu.addEventListener('click',()
 const fo=document.getElementById('fmt-ol');if(fo) fo.addEventListener('click',()=>{format('insertOrderedList');fo.classList.toggle('active')});
 const flink=document.getElementById('fmt-link');if(flink) flink.addEventListener('click',()=>{insertLink();flink.classList.toggle('active')});
 let saveTimer=null;
-function scheduleAutoSave(){if(saveTimer) clearTimeout(saveTimer);saveTimer=setTimeout(()=>{saveNote();saveTimer=null},900)}
-if(editorEl) editorEl.addEventListener('input',scheduleAutoSave);
-if(titleEl) titleEl.addEventListener('input',scheduleAutoSave);
-if(searchEl) searchEl.addEventListener('input',e=>renderNotesList(String(e.target.value||'').toLowerCase()));
-load();
-renderNotesList();
-if(notes.length){const last=notes.slice().sort((a,b)=>new Date(b.updated_at||b.created_at)-new Date(a.updated_at||a.created_at))[0];if(last) openNote(last.id)}
+function scheduleAutoSave(field){markDirty(field);if(saveTimer) clearTimeout(saveTimer);saveTimer=setTimeout(()=>{saveTimer=null;sync().then(()=>flash('Saved')).catch(e=>{console.error('save failed',e);flash('Save failed')})},900)}
+if(editorEl) editorEl.addEventListener('input',()=>{if(editorEl.querySelector('img[src^="data:"]')) hoistImages(editorEl).then(()=>scheduleAutoSave('content')).catch(e=>console.error('upload failed',e));else scheduleAutoSave('content')});
+if(editorEl) editorEl.addEventListener('paste',e=>{const files=[...((e.clipboardData&&e.clipboardData.files)||[])];if(!files.length) return;e.preventDefault();insertFiles(files)});
+if(editorEl) editorEl.addEventListener('drop',e=>{const files=[...((e.dataTransfer&&e.dataTransfer.files)||[])];if(!files.length) return;e.preventDefault();insertFiles(files)});
+if(titleEl) titleEl.addEventListener('input',()=>scheduleAutoSave('title'));
+let searchTimer=null;
+if(notesListEl) notesListEl.addEventListener('scroll',()=>{if(!scrollFrame) scrollFrame=requestAnimationFrame(()=>{scrollFrame=0;renderWindow()})});
+if(searchEl) searchEl.addEventListener('input',e=>{if(searchTimer) clearTimeout(searchTimer);searchTimer=setTimeout(()=>search(e.target.value),150)});
+load().then(migrateLocal).then(()=>{renderNotesList();if(notes.length) openNote(notes[0].id)}).catch(e=>console.error('load failed',e));
+setInterval(()=>{if(!document.hidden) sync().catch(()=>{})},5000);
+window.addEventListener('focus',()=>sync().catch(()=>{}));
+if(channel) channel.onmessage=()=>sync().catch(()=>{});
 window.addEventListener('keydown',e=>{const mod=e.ctrlKey||e.metaKey;if(mod&&e.key&&e.key.toLowerCase()==='s'){e.preventDefault();saveNote()}if(mod&&e.key&&e.key.toLowerCase()==='n'){e.preventDefault();newNote()}});
-window.NOTES_APP={get notes(){return notes},saveAll(){saveAll()}}
+window.NOTES_APP={get notes(){return notes},reload(){return load().then(refreshList)},sync}
 })();
 </script>
 </body>
 </html>
 """
 
+NOTES_SCHEMA = """
+CREATE TABLE IF NOT EXISTS notes (
+    pk INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    title TEXT NOT NULL DEFAULT '',
+    content TEXT NOT NULL DEFAULT '',
+    plain TEXT NOT NULL DEFAULT '',
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    seq INTEGER NOT NULL DEFAULT 0,
+    deleted INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS notes_seq ON notes (seq);
+-- The list is served newest-first from this index, one cursor page at a time
+CREATE INDEX IF NOT EXISTS notes_live_updated ON notes (updated_at DESC, id DESC) WHERE deleted = 0;
+CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(
+    title, plain, content='notes', content_rowid='pk', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS notes_ai AFTER INSERT ON notes BEGIN
+    INSERT INTO notes_fts (rowid, title, plain) VALUES (new.pk, new.title, new.plain);
+END;
+CREATE TRIGGER IF NOT EXISTS notes_ad AFTER DELETE ON notes BEGIN
+    INSERT INTO notes_fts (notes_fts, rowid, title, plain) VALUES ('delete', old.pk, old.title, old.plain);
+END;
+CREATE TRIGGER IF NOT EXISTS notes_au AFTER UPDATE ON notes BEGIN
+    INSERT INTO notes_fts (notes_fts, rowid, title, plain) VALUES ('delete', old.pk, old.title, old.plain);
+    INSERT INTO notes_fts (rowid, title, plain) VALUES (new.pk, new.title, new.plain);
+END;
+"""
+
+class _TextExtractor(HTMLParser):
+    BLOCKS = {'br', 'p', 'div', 'li', 'h1', 'h2', 'h3', 'tr'}
+
+    def __init__(self):
+        super().__init__()
+        self.parts = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.BLOCKS:
+            self.parts.append(' ')
+
+    def handle_data(self, data):
+        self.parts.append(data)
+
+def plain_text(content):
+    parser = _TextExtractor()
+    parser.feed(content or '')
+    parser.close()
+    return ' '.join(''.join(parser.parts).split())
+
+def now_iso():
+    # Same shape as JavaScript's Date.toISOString()
+    return datetime.now(timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z')
+
+def fts_query(text):
+    # Every word must match, as a prefix, so typing "meet" finds "meeting"
+    words = [w.replace('"', '""') for w in text.split()]
+    return ' '.join(f'"{w}"*' for w in words)
+
+def encode_cursor(updated_at, note_id):
+    return base64.urlsafe_b64encode(json.dumps([updated_at, note_id]).encode()).decode()
+
+def decode_cursor(cursor):
+    try:
+        updated_at, note_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f'invalid cursor: {cursor!r}') from e
+    return str(updated_at), str(note_id)
+
+def valid_change(change):
+    # A sync patch as NoteStore.apply() expects it: an object with a string
+    # id, where present string fields, and a real boolean for deleted
+    return (isinstance(change, dict) and isinstance(change.get('id'), str)
+            and all(isinstance(change.get(k), (str, type(None)))
+                    for k in ('title', 'content', 'created_at', 'updated_at'))
+            and isinstance(change.get('deleted', False), bool))
+
+class NoteStore:
+    """SQLite-backed notes with an FTS5 index over title and plain text.
+
+    The database runs in WAL mode and each server thread gets its own
+    connection, so searches never wait behind a save. Every write stamps
+    the note with the next value of a global sequence number; deletes
+    leave a tombstone. Clients sync by sending per-note patches and asking
+    for everything after the last sequence number they have seen.
+    """
+
+    SUMMARY = 'id, title, substr(plain, 1, 121) AS plain, created_at, updated_at, seq'
+
+    def __init__(self, path='notes.db'):
+        self.path = path
+        self._local = threading.local()
+        db = self._db()
+        db.executescript(NOTES_SCHEMA)
+
+    def _db(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30)
+            db.row_factory = sqlite3.Row
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            self._local.db = db
+        return db
+
+    @staticmethod
+    def _summary(row):
+        plain = row['plain']
+        return {'id': row['id'], 'title': row['title'], 'created_at': row['created_at'],
+                'updated_at': row['updated_at'], 'seq': row['seq'],
+                'snippet': plain[:120] + '...' if len(plain) > 120 else plain}
+
+    def current_seq(self):
+        return self._db().execute('SELECT COALESCE(MAX(seq), 0) FROM notes').fetchone()[0]
+
+    def page(self, limit=50, cursor=None):
+        """Return one page of live notes, newest first, and the cursor for the next one."""
+        if cursor:
+            updated_at, note_id = decode_cursor(cursor)
+            rows = self._db().execute(
+                f'SELECT {self.SUMMARY} FROM notes WHERE deleted = 0 AND (updated_at, id) < (?, ?) '
+                'ORDER BY updated_at DESC, id DESC LIMIT ?', (updated_at, note_id, limit))
+        else:
+            rows = self._db().execute(
+                f'SELECT {self.SUMMARY} FROM notes WHERE deleted = 0 ORDER BY updated_at DESC, id DESC LIMIT ?',
+                (limit,))
+        notes = [self._summary(r) for r in rows]
+        next_cursor = encode_cursor(notes[-1]['updated_at'], notes[-1]['id']) if notes and len(notes) == limit else None
+        return {'notes': notes, 'next_cursor': next_cursor}
+
+    def search(self, text, limit=50):
+        query = fts_query(text)
+        if not query:
+            return self.page(limit)['notes']
+        rows = self._db().execute(
+            "SELECT n.id, n.title, n.created_at, n.updated_at, n.seq, "
+            "snippet(notes_fts, 1, char(2), char(3), '...', 16) AS snippet "
+            "FROM notes_fts JOIN notes n ON n.pk = notes_fts.rowid "
+            "WHERE notes_fts MATCH ? AND n.deleted = 0 ORDER BY bm25(notes_fts, 5.0, 1.0) LIMIT ?", (query, limit))
+        return [dict(r) for r in rows]
+
+    def get(self, note_id):
+        row = self._db().execute(
+            'SELECT id, title, content, created_at, updated_at, seq FROM notes WHERE id = ? AND deleted = 0',
+            (note_id,)).fetchone()
+        return dict(row) if row else None
+
+    def apply(self, changes):
+        """Apply per-note patches and return their new sequence numbers by id.
+
+        A patch is {'id': ..., 'title': ..., 'content': ...} with either field
+        optional, or {'id': ..., 'deleted': True}. The last write wins.
+        """
+        db = self._db()
+        applied = {}
+        with db:
+            db.execute('BEGIN IMMEDIATE')
+            seq = db.execute('SELECT COALESCE(MAX(seq), 0) FROM notes').fetchone()[0]
+            for change in changes:
+                note_id = change.get('id')
+                if not note_id:
+                    continue
+                now = now_iso()
+                old = db.execute('SELECT title, content, deleted FROM notes WHERE id = ?', (note_id,)).fetchone()
+                if change.get('deleted'):
+                    # Deleting a missing or already deleted note changes nothing
+                    if old is None or old['deleted']:
+                        continue
+                    title = content = ''
+                else:
+                    title = change['title'] if 'title' in change else (old['title'] if old else '')
+                    content = change['content'] if 'content' in change else (old['content'] if old else '')
+                seq += 1
+                db.execute(
+                    'INSERT INTO notes (id, title, content, plain, created_at, updated_at, seq, deleted) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?) '
+                    'ON CONFLICT (id) DO UPDATE SET title = excluded.title, content = excluded.content, '
+                    'plain = excluded.plain, updated_at = excluded.updated_at, seq = excluded.seq, '
+                    'deleted = excluded.deleted',
+                    (note_id, title or '', content or '', plain_text(content),
+                     change.get('created_at') or now, change.get('updated_at') or now, seq,
+                     1 if change.get('deleted') else 0))
+                applied[note_id] = seq
+        return applied
+
+    def changes_since(self, since, limit=500):
+        rows = self._db().execute(
+            f'SELECT {self.SUMMARY}, content, deleted FROM notes WHERE seq > ? ORDER BY seq LIMIT ?', (since, limit))
+        changes = []
+        for row in rows:
+            change = self._summary(row)
+            change['deleted'] = bool(row['deleted'])
+            if not change['deleted']:
+                change['content'] = row['content']
+            changes.append(change)
+        return changes
+
+    def sync(self, since, changes, limit=500):
+        applied = self.apply(changes)
+        remote = self.changes_since(since, limit)
+        for change in remote:
+            # The sender already has the content of its own patches
+            if applied.get(change['id']) == change['seq']:
+                change.pop('content', None)
+        # Only advance as far as what was actually read: a write committed
+        # after changes_since() must still be newer than the returned seq
+        seq = max(since, remote[-1]['seq']) if remote else since
+        return {'seq': seq, 'applied': applied, 'changes': remote, 'more': len(remote) == limit}
+
+    def put(self, note_id, title, content, created_at=None, updated_at=None):
+        self.apply([{'id': note_id, 'title': title, 'content': content,
+                     'created_at': created_at, 'updated_at': updated_at}])
+        row = self._db().execute(f'SELECT {self.SUMMARY} FROM notes WHERE id = ?', (note_id,)).fetchone()
+        return self._summary(row)
+
+    def delete(self, note_id):
+        return bool(self.apply([{'id': note_id, 'deleted': True}]))
+
+BLOB_CHUNK = 256 * 1024
+MAX_BLOB_BYTES = 64 * 1024 * 1024
+BLOB_HASH = re.compile('[0-9a-f]{64}')
+# Served types are sniffed from the bytes, never taken from the uploader, so a
+# blob can't be turned into a page on this origin
+BLOB_TYPES = [
+    (b'\x89PNG', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF8', 'image/gif'),
+    (b'RIFF', 'image/webp'),
+    (b'%PDF', 'application/pdf'),
+]
+
+class BlobStore:
+    """Content-addressed files on disk, one per SHA-256 digest.
+
+    Uploads are hashed while they stream into a temporary file, then renamed
+    to blobs/<aa>/<digest>; an identical upload finds the name taken and is
+    dropped, so each distinct file is stored once however many notes use it.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._tmp = os.path.join(directory, 'tmp')
+        os.makedirs(self._tmp, exist_ok=True)
+
+    def path(self, digest):
+        if not BLOB_HASH.fullmatch(digest):
+            return None
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def put(self, stream, length):
+        """Copy length bytes from stream into the store and return (digest, created)."""
+        digest = hashlib.sha256()
+        fd, tmp = tempfile.mkstemp(dir=self._tmp)
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                buf = bytearray(BLOB_CHUNK)
+                view = memoryview(buf)
+                remaining = length
+                while remaining:
+                    n = stream.readinto(view[:min(remaining, BLOB_CHUNK)])
+                    if not n:
+                        raise EOFError('upload ended early')
+                    digest.update(view[:n])
+                    file.write(view[:n])
+                    remaining -= n
+            hexdigest = digest.hexdigest()
+            path = self.path(hexdigest)
+            if os.path.exists(path):
+                return hexdigest, False
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp, path)
+            tmp = None
+            return hexdigest, True
+        finally:
+            if tmp is not None:
+                os.unlink(tmp)
+
+def sniff_type(head):
+    for magic, content_type in BLOB_TYPES:
+        if head.startswith(magic):
+            if content_type == 'image/webp' and head[8:12] != b'WEBP':
+                continue
+            return content_type
+    return 'application/octet-stream'
+
+def parse_range(header, size):
+    """Return (start, end) inclusive for a single 'bytes=' range, or None to send it all.
+
+    Raises ValueError when the range can't be satisfied.
+    """
+    if not header or not header.startswith('bytes=') or ',' in header:
+        return None
+    first, _, last = header[6:].strip().partition('-')
+    try:
+        if not first:
+            start, end = max(size - int(last), 0), size - 1
+        else:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+    except ValueError:
+        return None
+    if start > end or start >= size:
+        raise ValueError(header)
+    return start, end
+
+def _encodings(html):
+    # Encode and compress the page once; requests just pick a variant
+    body = html.encode('utf-8')
+    variants = {'identity': body, 'gzip': gzip.compress(body, compresslevel=9)}
+    if brotli is not None:
+        variants['br'] = brotli.compress(body, quality=11)
+    return variants
+
+index_variants = _encodings(index_html)
+index_etag = '"' + hashlib.sha256(index_variants['identity']).hexdigest()[:16] + '"'
+
+def pick_encoding(accept_encoding, available):
+    accepted = {}
+    for part in (accept_encoding or '').split(','):
+        name, _, params = part.strip().partition(';')
+        q = 1.0
+        if params.strip().startswith('q='):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    for name in ('br', 'gzip'):
+        if name in available and accepted.get(name, accepted.get('*', 0)) > 0:
+            return name
+    return 'identity'
+
 class Handler(BaseHTTPRequestHandler):
-    def do_GET(self):
-        if self.path in ('/', '/index.html'):
-            self.send_response(200)
-            self.send_header('Content-type', 'text/html; charset=utf-8')
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out as separate writes on a kept-alive socket
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_empty(self, status):
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def _send_index(self, head=False):
+        etags = [t.strip() for t in self.headers.get('If-None-Match', '').split(',')]
+        if index_etag in etags or '*' in etags:
+            self.send_response(304)
+            self.send_header('ETag', index_etag)
+            self.send_header('Cache-Control', 'no-cache')
             self.end_headers()
-            self.wfile.write(index_html.encode('utf-8'))
+            return
+        encoding = pick_encoding(self.headers.get('Accept-Encoding'), index_variants)
+        body = index_variants[encoding]
+        self.send_response(200)
+        self.send_header('Content-type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        if encoding != 'identity':
+            self.send_header('Content-Encoding', encoding)
+        self.send_header('Vary', 'Accept-Encoding')
+        self.send_header('ETag', index_etag)
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+    def _send_json(self, status, obj):
+        body = json.dumps(obj).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        data = json.loads(self.rfile.read(length) or b'{}')
+        if not isinstance(data, dict):
+            raise ValueError('expected a JSON object')
+        return data
+
+    def _send_blob(self, digest, head=False):
+        path = self.server.blobs.path(digest)
+        try:
+            file = open(path, 'rb') if path else None
+        except FileNotFoundError:
+            file = None
+        if file is None:
+            self._send_empty(404)
+            return
+        with file:
+            size = os.fstat(file.fileno()).st_size
+            etag = f'"{digest}"'
+            if etag in self.headers.get('If-None-Match', ''):
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.end_headers()
+                return
+            try:
+                byte_range = parse_range(self.headers.get('Range'), size)
+            except ValueError:
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{size}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            start, end = byte_range or (0, size - 1)
+            self.send_response(206 if byte_range else 200)
+            self.send_header('Content-Type', sniff_type(file.read(16)))
+            self.send_header('Content-Length', str(end - start + 1))
+            if byte_range:
+                self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+            self.send_header('Accept-Ranges', 'bytes')
+            self.send_header('ETag', etag)
+            # The URL is the hash of the bytes, so the response can never change
+            self.send_header('Cache-Control', 'public, max-age=31536000, immutable')
+            self.send_header('X-Content-Type-Options', 'nosniff')
+            self.end_headers()
+            if not head and end >= start:
+                # Kernel copies straight from the page cache to the socket
+                self.connection.sendfile(file, start, end - start + 1)
+
+    def _receive_blob(self):
+        length = self.headers.get('Content-Length')
+        if length is None:
+            self._send_json(411, {'error': 'Content-Length required'})
+            return
+        try:
+            length = int(length)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self._send_json(400, {'error': 'invalid Content-Length'})
+            self.close_connection = True
+            return
+        if length > MAX_BLOB_BYTES:
+            self._send_json(413, {'error': f'uploads are limited to {MAX_BLOB_BYTES} bytes'})
+            self.close_connection = True
+            return
+        try:
+            digest, created = self.server.blobs.put(self.rfile, length)
+        except EOFError:
+            self.close_connection = True
+            return
+        self._send_json(201 if created else 200, {'hash': digest, 'url': f'/blobs/{digest}', 'size': length})
+
+    def _note_id(self, path):
+        # /api/notes/<id> -> id, /api/notes -> ''
+        return unquote(path[len('/api/notes/'):]) if path.startswith('/api/notes/') else ''
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        store = self.server.store
+        if url.path in ('/', '/index.html'):
+            self._send_index()
+        elif url.path == '/api/notes':
+            params = parse_qs(url.query)
+            try:
+                limit = max(1, min(int(params.get('limit', ['50'])[0]), 500))
+            except ValueError:
+                self._send_json(400, {'error': 'invalid limit'})
+                return
+            q = params.get('q', [''])[0]
+            seq = store.current_seq()
+            if q.strip():
+                self._send_json(200, {'notes': store.search(q, limit), 'seq': seq})
+                return
+            try:
+                page = store.page(limit, params.get('cursor', [None])[0])
+            except ValueError:
+                self._send_json(400, {'error': 'invalid cursor'})
+                return
+            self._send_json(200, dict(page, seq=seq))
+        elif url.path.startswith('/blobs/'):
+            self._send_blob(url.path[len('/blobs/'):])
+        elif self._note_id(url.path):
+            note = store.get(self._note_id(url.path))
+            if note is None:
+                self._send_json(404, {'error': 'not found'})
+            else:
+                self._send_json(200, note)
         else:
-            self.send_response(404)
+            self._send_empty(404)
+
+    def do_HEAD(self):
+        path = urlsplit(self.path).path
+        if path in ('/', '/index.html'):
+            self._send_index(head=True)
+        elif path.startswith('/blobs/'):
+            self._send_blob(path[len('/blobs/'):], head=True)
+        else:
+            self._send_empty(404)
+
+    def do_PUT(self):
+        note_id = self._note_id(urlsplit(self.path).path)
+        if not note_id:
+            self._send_empty(404)
+            return
+        try:
+            data = self._read_json()
+        except ValueError:
+            self._send_json(400, {'error': 'invalid JSON'})
+            return
+        if not valid_change(dict(data, id=note_id)):
+            self._send_json(400, {'error': 'invalid note'})
+            return
+        self._send_json(200, self.server.store.put(note_id, data.get('title'), data.get('content'),
+                                                   data.get('created_at'), data.get('updated_at')))
+
+    def do_POST(self):
+        path = urlsplit(self.path).path
+        if path == '/api/blobs':
+            self._receive_blob()
+            return
+        if path != '/api/sync':
+            self._send_empty(404)
+            return
+        try:
+            data = self._read_json()
+            since = int(data.get('since') or 0)
+            changes = list(data.get('changes') or [])
+            if not all(valid_change(c) for c in changes):
+                raise ValueError('invalid change')
+        except (ValueError, TypeError):
+            self._send_json(400, {'error': 'invalid sync request'})
+            return
+        self._send_json(200, self.server.store.sync(since, changes))
+
+    def do_DELETE(self):
+        note_id = self._note_id(urlsplit(self.path).path)
+        if note_id and self.server.store.delete(note_id):
+            self.send_response(204)
+            self.send_header('Content-Length', '0')
             self.end_headers()
+        else:
+            self._send_json(404, {'error': 'not found'})
+
+def make_server(host='0.0.0.0', port=8000, db_path=None, blob_dir=None):
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    server.store = NoteStore(db_path or os.environ.get('NOTES_DB', 'notes.db'))
+    server.blobs = BlobStore(blob_dir or os.environ.get('NOTES_BLOBS', 'notes_blobs'))
+    return server
 
 if __name__ == '__main__':
     port = 8000
     try:
-        server = HTTPServer(('0.0.0.0', port), Handler)
+        server = make_server(port=port)
         print(f'Serving at http://127.0.0.1:{port}')
         try:
             webbrowser.open(f'http://127.0.0.1:{port}')
@@ -145,4 +727,4 @@ if __name__ == '__main__':
             pass
         server.serve_forever()
     except OSError as e:
-        print('Port in use or permission denied:', e)
\ No newline at end of file
+        print('Port in use or permission denied:', e)
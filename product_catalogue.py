@@ -0,0 +1,152 @@
+import csv
+import mmap
+import os
+import random
+import struct
+import time
+
+MAGIC = b"PCAT1\0\0\0"
+HEADER = struct.Struct("<8sQ")
+SEP = b"\x1f"
+
+
+def build_index(source, index_path):
+    """Turn a CSV or Parquet catalogue into a sorted, mmap-able index file.
+
+    The file holds a header, an array of record offsets and then one record
+    per SKU sorted by Product_Code: code, category and price joined by 0x1f.
+    """
+    if source.endswith(".parquet"):
+        import pandas as pd
+        df = pd.read_parquet(source, columns=["Product_Code", "Category", "Price"])
+        rows = zip(df["Product_Code"].astype(str), df["Category"].astype(str), df["Price"].astype(float))
+    else:
+        with open(source, newline="", encoding="utf-8") as file:
+            rows = [(r["Product_Code"], r["Category"], float(r["Price"])) for r in csv.DictReader(file)]
+
+    records = {}
+    for code, category, price in rows:
+        code = code.strip()
+        if code:
+            records[code.encode()] = SEP.join([code.encode(), category.encode(), repr(price).encode()])
+    keys = sorted(records)
+
+    offsets = [0]
+    for key in keys:
+        offsets.append(offsets[-1] + len(records[key]))
+    tmp = f"{index_path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as file:
+        file.write(HEADER.pack(MAGIC, len(keys)))
+        file.write(struct.pack(f"<{len(offsets)}Q", *offsets))
+        for key in keys:
+            file.write(records[key])
+    os.replace(tmp, index_path)
+
+
+class Catalogue:
+    """Read-only product catalogue over a memory-mapped index file.
+
+    Every worker process maps the same file, so the SKUs live once in the
+    page cache instead of once per session. Codes are kept sorted, which
+    makes both exact and prefix lookups a binary search.
+    """
+
+    def __init__(self, index_path):
+        with open(index_path, "rb") as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._count = HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            raise ValueError(f"{index_path} is not a catalogue index")
+        start = HEADER.size
+        self._offsets = memoryview(self._map)[start:start + 8 * (self._count + 1)].cast("Q")
+        self._data = start + 8 * (self._count + 1)
+
+    def __len__(self):
+        return self._count
+
+    def _code(self, i):
+        start = self._data + self._offsets[i]
+        return self._map[start:self._map.find(SEP, start)]
+
+    def _record(self, i):
+        code, category, price = self._map[self._data + self._offsets[i]:self._data + self._offsets[i + 1]].split(SEP)
+        return code.decode(), category.decode(), float(price)
+
+    def _lower_bound(self, key):
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._code(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def lookup(self, code):
+        """Return (category, price) for an exact Product_Code, or None."""
+        key = code.strip().encode()
+        i = self._lower_bound(key)
+        if i < self._count and self._code(i) == key:
+            return self._record(i)[1:]
+        return None
+
+    def prefix(self, prefix, limit=20):
+        """Return up to limit Product_Codes starting with prefix, in sorted order."""
+        key = prefix.strip().encode()
+        codes = []
+        i = self._lower_bound(key)
+        while i < self._count and len(codes) < limit:
+            code = self._code(i)
+            if not code.startswith(key):
+                break
+            codes.append(code.decode())
+            i += 1
+        return codes
+
+    def close(self):
+        self._offsets.release()
+        self._map.close()
+
+
+def open_catalogue(source):
+    """Open the index for a CSV/Parquet catalogue, rebuilding it when the source is newer."""
+    if source.endswith(".idx"):
+        return Catalogue(source)
+    index_path = source + ".idx"
+    if not os.path.exists(index_path) or os.path.getmtime(index_path) < os.path.getmtime(source):
+        build_index(source, index_path)
+    return Catalogue(index_path)
+
+
+def benchmark(skus=200_000, lookups=20_000):
+    import tempfile
+    categories = ["Shirt", "Pants", "T-Shirt", "Trouser"]
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, "catalogue.csv")
+        with open(source, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(["Product_Code", "Category", "Price"])
+            for i in range(skus):
+                writer.writerow([f"SKU{random.randrange(10**7):07d}", random.choice(categories), round(random.uniform(1, 200), 2)])
+
+        start = time.perf_counter()
+        catalogue = open_catalogue(source)
+        print(f"indexed {len(catalogue):,} SKUs in {time.perf_counter() - start:.2f}s")
+
+        prefixes = [f"SKU{random.randrange(10**4):04d}" for _ in range(lookups)]
+        start = time.perf_counter()
+        for p in prefixes:
+            catalogue.prefix(p)
+        print(f"prefix lookup: {(time.perf_counter() - start) / lookups * 1e6:.1f} us")
+
+        codes = [catalogue.prefix(p, 1) for p in prefixes[:1000]]
+        codes = [c[0] for c in codes if c]
+        start = time.perf_counter()
+        for c in codes:
+            catalogue.lookup(c)
+        print(f"exact lookup:  {(time.perf_counter() - start) / len(codes) * 1e6:.1f} us")
+        catalogue.close()
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,153 @@
+from array import array
+from collections import namedtuple
+import time
+import uuid
+
+COLUMNS = ("id", "Product_Code", "Qty", "Category", "Price")
+Item = namedtuple("Item", COLUMNS)
+
+
+class ItemStore:
+    """Columnar basket store with a uuid -> row index.
+
+    Add, update and remove are O(1) amortized: columns grow by doubling,
+    removed rows are tombstoned and squeezed out once they outnumber the
+    live ones, so the basket keeps its insertion order. The subtotal is
+    kept as a running aggregate and version counts every change.
+    """
+
+    def __init__(self, capacity=64):
+        self._capacity = capacity
+        self._ids = [None] * capacity
+        self._codes = [None] * capacity
+        self._categories = [None] * capacity
+        self._qty = array("d", bytes(8 * capacity))
+        self._price = array("d", bytes(8 * capacity))
+        self._index = {}
+        self._size = 0
+        self._subtotal = 0.0
+        self.version = 0
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, uid):
+        return uid in self._index
+
+    def __iter__(self):
+        ids, codes, qty, categories, price = self._ids, self._codes, self._qty, self._categories, self._price
+        for row in range(self._size):
+            if ids[row] is not None:
+                yield Item(ids[row], codes[row], qty[row], categories[row], price[row])
+
+    def _grow(self):
+        extra = self._capacity
+        self._ids.extend([None] * extra)
+        self._codes.extend([None] * extra)
+        self._categories.extend([None] * extra)
+        self._qty.extend(array("d", bytes(8 * extra)))
+        self._price.extend(array("d", bytes(8 * extra)))
+        self._capacity += extra
+
+    def _compact(self):
+        live = 0
+        for row in range(self._size):
+            uid = self._ids[row]
+            if uid is None:
+                continue
+            if live != row:
+                self._ids[live] = uid
+                self._codes[live] = self._codes[row]
+                self._categories[live] = self._categories[row]
+                self._qty[live] = self._qty[row]
+                self._price[live] = self._price[row]
+                self._index[uid] = live
+            live += 1
+        for row in range(live, self._size):
+            self._ids[row] = self._codes[row] = self._categories[row] = None
+        self._size = live
+        # Re-sum from the columns to drop any float drift from the running total
+        self._subtotal = sum(self._qty[row] * self._price[row] for row in range(live))
+
+    def add(self, code, qty, category, price, uid=None):
+        if uid is None:
+            uid = uuid.uuid4().hex
+        if self._size == self._capacity:
+            self._grow()
+        row = self._size
+        self._ids[row] = uid
+        self._codes[row] = code
+        self._categories[row] = category
+        self._qty[row] = qty
+        self._price[row] = price
+        self._index[uid] = row
+        self._size += 1
+        self._subtotal += self._qty[row] * self._price[row]
+        self.version += 1
+        return uid
+
+    def update(self, uid, code, qty, category, price):
+        row = self._index.get(uid)
+        if row is None:
+            return False
+        self._subtotal -= self._qty[row] * self._price[row]
+        self._codes[row] = code
+        self._categories[row] = category
+        self._qty[row] = qty
+        self._price[row] = price
+        self._subtotal += self._qty[row] * self._price[row]
+        self.version += 1
+        return True
+
+    def remove(self, uid):
+        row = self._index.pop(uid, None)
+        if row is None:
+            return False
+        self._subtotal -= self._qty[row] * self._price[row]
+        self._ids[row] = self._codes[row] = self._categories[row] = None
+        self.version += 1
+        if self._size - len(self._index) > max(len(self._index), 32):
+            self._compact()
+        return True
+
+    def get(self, uid):
+        row = self._index.get(uid)
+        if row is None:
+            return None
+        return Item(uid, self._codes[row], self._qty[row], self._categories[row], self._price[row])
+
+    def clear(self):
+        version = self.version
+        self.__init__(self._capacity)
+        self.version = version + 1
+
+    def subtotal(self):
+        return self._subtotal if self._index else 0.0
+
+
+def benchmark(sizes=(10, 100, 1_000, 10_000), ops=2_000):
+    print(f"{'items':>8} {'add us/op':>10} {'update us/op':>13} {'remove us/op':>13}")
+    for size in sizes:
+        store = ItemStore()
+        for i in range(size):
+            store.add(f"P{i:05d}", 1, "Shirt", 9.99)
+
+        start = time.perf_counter()
+        new = [store.add("NEW", 2, "Pants", 19.99) for _ in range(ops)]
+        add_cost = (time.perf_counter() - start) / ops
+
+        start = time.perf_counter()
+        for uid in new:
+            store.update(uid, "UPD", 3, "Trouser", 24.5)
+        update_cost = (time.perf_counter() - start) / ops
+
+        start = time.perf_counter()
+        for uid in new:
+            store.remove(uid)
+        remove_cost = (time.perf_counter() - start) / ops
+
+        print(f"{size:>8} {add_cost * 1e6:>10.2f} {update_cost * 1e6:>13.2f} {remove_cost * 1e6:>13.2f}")
+
+
+if __name__ == "__main__":
+    benchmark()
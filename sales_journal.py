@@ -0,0 +1,315 @@
+import datetime
+import fcntl
+import glob
+import json
+import os
+import threading
+import time
+from receipt_store import ItemStore
+
+SALE_COLUMNS = ("receipt", "basket", "ts", "tax_pct", "Product_Code", "Qty", "Category", "Price", "seq")
+
+
+class SalesJournal:
+    """Crash-safe, append-only journal of basket edits and completed sales.
+
+    Every event goes to a write-ahead log as one JSON line. A writer thread
+    drains whatever has queued up since its last fsync and commits it as a
+    group, so a button press never waits on the disk. A sale closes its
+    basket, so later edits start a new one. Every compact_every records the
+    open baskets are snapshotted, completed sales are moved to a columnar
+    segment file and the log is truncated, which keeps start-up replay short.
+
+    A journal directory belongs to one process at a time: it is locked on
+    open, and a second opener gets BlockingIOError. Worker processes each
+    claim their own directory with open_worker_journal().
+    """
+
+    def __init__(self, directory="sales_journal", compact_every=10_000, commit_delay=0.0):
+        os.makedirs(directory, exist_ok=True)
+        self._lock_file = open(os.path.join(directory, "lock"), "a")
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            self._lock_file.close()
+            raise
+        self.directory = directory
+        self.name = os.path.basename(os.path.normpath(directory))
+        self.compact_every = compact_every
+        self.commit_delay = commit_delay
+        self.baskets = {}
+        self._wal_path = os.path.join(directory, "journal.wal")
+        self._snapshot_path = os.path.join(directory, "open_baskets.json")
+        self._sales = {name: [] for name in SALE_COLUMNS}
+        self._seq = 0
+        self._durable = 0
+        self._since_compact = 0
+        self._queue = []
+        self._closed = False
+        self._cond = threading.Condition()
+        self._io_lock = threading.Lock()
+
+        self._recover()
+        self._wal = open(self._wal_path, "ab")
+        self._writer = threading.Thread(target=self._run, name="sales-journal", daemon=True)
+        self._writer.start()
+
+    # -- recovery -----------------------------------------------------------
+
+    def _recover(self):
+        snapshot_seq = 0
+        if os.path.exists(self._snapshot_path):
+            with open(self._snapshot_path) as file:
+                snapshot = json.load(file)
+            snapshot_seq = snapshot["seq"]
+            for basket, rows in snapshot["baskets"].items():
+                store = self.basket(basket)
+                for uid, code, qty, category, price in rows:
+                    store.add(code, qty, category, price, uid=uid)
+        # Sales up to the newest segment are already in it, even when a crash
+        # came before the snapshot that goes with it was written
+        segment_seq = max([0] + [seq for seq, _ in self._segments()])
+        self._seq = max(snapshot_seq, segment_seq)
+
+        if not os.path.exists(self._wal_path):
+            return
+        good = 0
+        with open(self._wal_path, "rb") as file:
+            for line in file:
+                # A record only counts once its newline is on disk; a tear can
+                # cut off just the newline and leave a line that still parses
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break  # torn write at the tail of the log
+                good += len(line)
+                if record["seq"] > snapshot_seq:
+                    self._apply(record, record["seq"] > segment_seq)
+                self._seq = max(self._seq, record["seq"])
+                self._since_compact += 1
+        # Cut off the torn tail so new records don't get appended onto it
+        if good < os.path.getsize(self._wal_path):
+            with open(self._wal_path, "r+b") as file:
+                file.truncate(good)
+                os.fsync(file.fileno())
+        self._durable = self._seq
+
+    def _segments(self):
+        for path in sorted(glob.glob(os.path.join(self.directory, "sales_*.json"))):
+            yield int(os.path.basename(path)[6:-5]), path
+
+    def _apply(self, record, keep_sale=True):
+        op = record["op"]
+        store = self.basket(record["basket"])
+        if op == "sale":
+            if keep_sale:
+                for code, qty, category, price in record["lines"]:
+                    for name, value in zip(SALE_COLUMNS, (record["receipt"], record["basket"], record["ts"],
+                                                          record["tax_pct"], code, qty, category, price,
+                                                          record["seq"])):
+                        self._sales[name].append(value)
+            store.clear()
+        elif op == "add":
+            store.add(record["code"], record["qty"], record["category"], record["price"], uid=record["id"])
+        elif op == "update":
+            store.update(record["id"], record["code"], record["qty"], record["category"], record["price"])
+        elif op == "remove":
+            store.remove(record["id"])
+        elif op == "clear":
+            store.clear()
+
+    # -- group commit -------------------------------------------------------
+
+    def _log(self, record, apply=False):
+        with self._cond:
+            self._seq += 1
+            record["seq"] = self._seq
+            if apply:
+                # Applied under the lock so a compaction can't slip in between
+                # numbering the record and adding it to the pending sales
+                self._apply(record)
+            self._queue.append(json.dumps(record, separators=(",", ":")).encode() + b"\n")
+            self._since_compact += 1
+            self._cond.notify_all()
+            seq = self._seq
+        if self._since_compact >= self.compact_every:
+            self.compact()
+        return seq
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if self._closed and not self._queue:
+                    return
+            if self.commit_delay:
+                time.sleep(self.commit_delay)
+            with self._io_lock:
+                self._commit()
+
+    def _commit(self):
+        # Caller holds _io_lock
+        with self._cond:
+            batch, self._queue = self._queue, []
+            seq = self._seq
+        if batch:
+            self._wal.write(b"".join(batch))
+            self._wal.flush()
+            os.fsync(self._wal.fileno())
+        with self._cond:
+            self._durable = max(self._durable, seq)
+            self._cond.notify_all()
+
+    def wait(self, seq):
+        """Block until the record numbered seq is on disk."""
+        with self._cond:
+            while self._durable < seq:
+                self._cond.wait()
+
+    # -- events -------------------------------------------------------------
+
+    def basket(self, basket):
+        store = self.baskets.get(basket)
+        if store is None:
+            store = self.baskets[basket] = ItemStore()
+        return store
+
+    def add(self, basket, code, qty, category, price):
+        uid = self.basket(basket).add(code, qty, category, price)
+        self._log({"op": "add", "basket": basket, "id": uid, "code": code, "qty": qty,
+                   "category": category, "price": price})
+        return uid
+
+    def update(self, basket, uid, code, qty, category, price):
+        if not self.basket(basket).update(uid, code, qty, category, price):
+            return False
+        self._log({"op": "update", "basket": basket, "id": uid, "code": code, "qty": qty,
+                   "category": category, "price": price})
+        return True
+
+    def remove(self, basket, uid):
+        if not self.basket(basket).remove(uid):
+            return False
+        self._log({"op": "remove", "basket": basket, "id": uid})
+        return True
+
+    def clear(self, basket):
+        self.basket(basket).clear()
+        self._log({"op": "clear", "basket": basket})
+
+    def sale(self, basket, receipt, tax_pct, now=None):
+        """Record the basket's current lines as a completed sale and empty the basket.
+
+        Returns the record's sequence number for wait(), or None when the
+        basket is empty.
+        """
+        store = self.basket(basket)
+        if not store:
+            return None
+        record = {"op": "sale", "basket": basket, "receipt": receipt, "tax_pct": tax_pct,
+                  "ts": (now or datetime.datetime.now()).timestamp(),
+                  "lines": [[r.Product_Code, r.Qty, r.Category, r.Price] for r in store]}
+        return self._log(record, apply=True)
+
+    # -- compaction ---------------------------------------------------------
+
+    def compact(self):
+        with self._io_lock:
+            self._commit()
+            with self._cond:
+                seq = self._seq
+                sales, self._sales = self._sales, {name: [] for name in SALE_COLUMNS}
+                self._since_compact = 0
+            if sales["receipt"]:
+                _write_atomic(os.path.join(self.directory, f"sales_{seq:012d}.json"), sales)
+            _write_atomic(self._snapshot_path, {
+                "seq": seq,
+                "baskets": {basket: [list(r) for r in store] for basket, store in self.baskets.items() if store},
+            })
+            self._wal.truncate(0)
+            self._wal.seek(0)
+            os.fsync(self._wal.fileno())
+
+    def read_sales(self, after=0):
+        """Return every completed sale line with a seq above after as a dict of columns.
+
+        A segment is named after the last seq it holds, so segments that end
+        at or before after are skipped without being read.
+        """
+        columns = {name: [] for name in SALE_COLUMNS}
+
+        def extend(sales):
+            keep = [i for i, seq in enumerate(sales["seq"]) if seq > after]
+            for name in SALE_COLUMNS:
+                columns[name].extend(sales[name][i] for i in keep)
+
+        for seq, path in self._segments():
+            if seq <= after:
+                continue
+            with open(path) as file:
+                extend(json.load(file))
+        with self._cond:
+            extend(self._sales)
+        return columns
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._writer.join()
+        with self._io_lock:
+            self._commit()
+        self._wal.close()
+        self._lock_file.close()
+
+
+def open_worker_journal(root="sales_journal", **kwargs):
+    """Open the first journal under root (worker-0, worker-1, ...) that no other process holds.
+
+    Seqs, snapshots and compaction are per journal, so every worker process
+    needs its own; after a restart the workers pick their directories up
+    again in the same way.
+    """
+    n = 0
+    while True:
+        try:
+            return SalesJournal(os.path.join(root, f"worker-{n}"), **kwargs)
+        except BlockingIOError:
+            n += 1
+
+
+def _write_atomic(path, data):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as file:
+        json.dump(data, file, separators=(",", ":"))
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp, path)
+
+
+def benchmark(events=20_000):
+    import tempfile
+    with tempfile.TemporaryDirectory() as directory:
+        journal = SalesJournal(directory)
+        start = time.perf_counter()
+        journal.add("sold", "P00000", 1, "Shirt", 9.99)
+        for i in range(events):
+            uid = journal.add("bench", f"P{i:05d}", 1, "Shirt", 9.99)
+            if i % 4 == 3:
+                journal.remove("bench", uid)
+        journal.wait(journal.sale("sold", "R1", 8))
+        elapsed = time.perf_counter() - start
+        journal.close()
+        print(f"logged {events} events in {elapsed:.3f}s ({events / elapsed:,.0f} events/s)")
+
+        start = time.perf_counter()
+        journal = SalesJournal(directory)
+        print(f"recovered {len(journal.basket('bench'))} open lines in {(time.perf_counter() - start) * 1000:.1f} ms")
+        journal.close()
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,177 @@
+import datetime
+import os
+import random
+import sqlite3
+import time
+from collections import defaultdict
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS by_category (category TEXT PRIMARY KEY, qty REAL, revenue REAL);
+CREATE TABLE IF NOT EXISTS by_product (code TEXT PRIMARY KEY, category TEXT, qty REAL, revenue REAL);
+CREATE INDEX IF NOT EXISTS by_product_revenue ON by_product (revenue DESC);
+CREATE TABLE IF NOT EXISTS by_day (day TEXT PRIMARY KEY, receipts INTEGER, qty REAL, revenue REAL);
+CREATE TABLE IF NOT EXISTS by_hour (day TEXT, hour INTEGER, receipts INTEGER, qty REAL, revenue REAL,
+                                    PRIMARY KEY (day, hour));
+CREATE TABLE IF NOT EXISTS by_hour_of_day (hour INTEGER PRIMARY KEY, receipts INTEGER, qty REAL, revenue REAL);
+CREATE TABLE IF NOT EXISTS applied (journal TEXT PRIMARY KEY, journal_seq INTEGER);
+"""
+
+
+class SalesRollups:
+    """Sales totals by category, product, day and hour, kept up to date per receipt.
+
+    Each completed sale is folded into small rollup tables with upserts, so
+    the dashboard reads a handful of pre-aggregated rows and never scans the
+    raw sales history. The SQLite file is in WAL mode and can be shared by
+    several worker processes. For each worker's journal, the seq of the
+    last sale folded in is stored with the totals, so catch_up() can add
+    any sale that was journaled but never reached the rollups.
+    """
+
+    def __init__(self, path="sales_rollups.sqlite3"):
+        self.db = sqlite3.connect(path, timeout=30)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+
+    def is_empty(self):
+        return self.db.execute("SELECT NOT EXISTS (SELECT 1 FROM by_day)").fetchone()[0]
+
+    def applied_seq(self, journal):
+        row = self.db.execute("SELECT journal_seq FROM applied WHERE journal = ?", (journal,)).fetchone()
+        return row[0] if row else 0
+
+    def record_sales(self, sales, journal=None, seq=None):
+        """Fold sales, an iterable of (datetime, [(code, qty, category, price), ...]), into the rollups.
+
+        seq is the seq of the newest sale in the batch in the named journal,
+        stored in the same transaction as the totals.
+        """
+        category = defaultdict(lambda: [0.0, 0.0])
+        product = {}
+        day = defaultdict(lambda: [0, 0.0, 0.0])
+        hour = defaultdict(lambda: [0, 0.0, 0.0])
+        hour_of_day = defaultdict(lambda: [0, 0.0, 0.0])
+
+        # Pre-aggregate the batch so each rollup row is written once
+        for ts, lines in sales:
+            d, h = ts.strftime("%Y-%m-%d"), ts.hour
+            qty_total = revenue_total = 0.0
+            for code, qty, cat, price in lines:
+                revenue = qty * price
+                qty_total += qty
+                revenue_total += revenue
+                c = category[cat]
+                c[0] += qty
+                c[1] += revenue
+                p = product.setdefault(code, [cat, 0.0, 0.0])
+                p[0] = cat
+                p[1] += qty
+                p[2] += revenue
+            for row in (day[d], hour[d, h], hour_of_day[h]):
+                row[0] += 1
+                row[1] += qty_total
+                row[2] += revenue_total
+
+        with self.db:
+            self.db.executemany(
+                "INSERT INTO by_category VALUES (?, ?, ?) ON CONFLICT (category) DO UPDATE SET "
+                "qty = qty + excluded.qty, revenue = revenue + excluded.revenue",
+                [(k, *v) for k, v in category.items()])
+            self.db.executemany(
+                "INSERT INTO by_product VALUES (?, ?, ?, ?) ON CONFLICT (code) DO UPDATE SET "
+                "category = excluded.category, qty = qty + excluded.qty, revenue = revenue + excluded.revenue",
+                [(k, *v) for k, v in product.items()])
+            self.db.executemany(
+                "INSERT INTO by_day VALUES (?, ?, ?, ?) ON CONFLICT (day) DO UPDATE SET "
+                "receipts = receipts + excluded.receipts, qty = qty + excluded.qty, revenue = revenue + excluded.revenue",
+                [(k, *v) for k, v in day.items()])
+            self.db.executemany(
+                "INSERT INTO by_hour VALUES (?, ?, ?, ?, ?) ON CONFLICT (day, hour) DO UPDATE SET "
+                "receipts = receipts + excluded.receipts, qty = qty + excluded.qty, revenue = revenue + excluded.revenue",
+                [(*k, *v) for k, v in hour.items()])
+            self.db.executemany(
+                "INSERT INTO by_hour_of_day VALUES (?, ?, ?, ?) ON CONFLICT (hour) DO UPDATE SET "
+                "receipts = receipts + excluded.receipts, qty = qty + excluded.qty, revenue = revenue + excluded.revenue",
+                [(k, *v) for k, v in hour_of_day.items()])
+            if seq is not None:
+                self.db.execute("INSERT INTO applied VALUES (?, ?) ON CONFLICT (journal) DO UPDATE SET "
+                                "journal_seq = max(journal_seq, excluded.journal_seq)", (journal, seq))
+
+    def record_sale(self, ts, lines, journal=None, seq=None):
+        self.record_sales([(ts, lines)], journal, seq)
+
+    def catch_up(self, journal):
+        """Fold in every sale from a SalesJournal that isn't in the rollups yet.
+
+        A new, empty rollup file is filled from the journal's whole history,
+        so deleting the file is how the rollups are rebuilt.
+        """
+        after = self.applied_seq(journal.name)
+        columns = journal.read_sales(after)
+        sales = {}
+        for i, seq in enumerate(columns["seq"]):
+            sales.setdefault((seq, columns["ts"][i]), []).append(
+                (columns["Product_Code"][i], columns["Qty"][i], columns["Category"][i], columns["Price"][i]))
+        self.record_sales(((datetime.datetime.fromtimestamp(ts), lines) for (_, ts), lines in sales.items()),
+                          journal.name, max((seq for seq, _ in sales), default=after))
+
+    # -- dashboard queries --------------------------------------------------
+
+    def by_category(self):
+        return self.db.execute("SELECT category, qty, revenue FROM by_category ORDER BY revenue DESC").fetchall()
+
+    def top_products(self, limit=10):
+        return self.db.execute(
+            "SELECT code, category, qty, revenue FROM by_product ORDER BY revenue DESC LIMIT ?", (limit,)).fetchall()
+
+    def by_hour(self, day=None):
+        if day is None:
+            return self.db.execute("SELECT hour, receipts, qty, revenue FROM by_hour_of_day ORDER BY hour").fetchall()
+        return self.db.execute(
+            "SELECT hour, receipts, qty, revenue FROM by_hour WHERE day = ? ORDER BY hour", (day,)).fetchall()
+
+    def by_day(self, limit=30):
+        return self.db.execute(
+            "SELECT day, receipts, qty, revenue FROM by_day ORDER BY day DESC LIMIT ?", (limit,)).fetchall()
+
+    def close(self):
+        self.db.close()
+
+
+def benchmark(lines=1_000_000, lines_per_receipt=10, products=50_000):
+    import tempfile
+    categories = ["Shirt", "Pants", "T-Shirt", "Trouser"]
+    with tempfile.TemporaryDirectory() as directory:
+        rollups = SalesRollups(os.path.join(directory, "rollups.sqlite3"))
+        start_day = datetime.datetime(2025, 1, 1)
+
+        start = time.perf_counter()
+        batch = []
+        for r in range(lines // lines_per_receipt):
+            ts = start_day + datetime.timedelta(minutes=7 * r)
+            batch.append((ts, [(f"SKU{random.randrange(products):05d}", random.randint(1, 3),
+                                random.choice(categories), 9.99) for _ in range(lines_per_receipt)]))
+            if len(batch) == 1_000:
+                rollups.record_sales(batch)
+                batch = []
+        rollups.record_sales(batch)
+        print(f"loaded {lines:,} line items in {time.perf_counter() - start:.1f}s")
+
+        queries = {
+            "by category": rollups.by_category,
+            "top products": rollups.top_products,
+            "by hour of day": rollups.by_hour,
+            "by hour, one day": lambda: rollups.by_hour("2025-03-01"),
+            "by day": rollups.by_day,
+        }
+        for name, query in queries.items():
+            start = time.perf_counter()
+            for _ in range(100):
+                query()
+            print(f"{name:>17}: {(time.perf_counter() - start) * 10:.3f} ms")
+        rollups.close()
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,150 @@
+import datetime
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+# Local stand-ins for the public APIs the scripts call, so benchmarks and
+# checks run offline and never hit rate limits. Each serve_* function starts
+# a server on a free port in a daemon thread and returns it; server.url is
+# its base URL and server.hits counts the requests it answered.
+
+FRANKFURTER_RATES = {
+    "AUD": 1.6612, "CAD": 1.4987, "CHF": 0.9402, "CNY": 7.8101, "GBP": 0.8468, "INR": 90.75,
+    "JPY": 161.42, "USD": 1.0854, "SEK": 11.43, "NZD": 1.8120,
+}
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out as separate writes on a kept-alive socket
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, obj, headers=()):
+        body = json.dumps(obj).encode()
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.hits += 1
+        url = urlsplit(self.path)
+        self.handle_get(url.path, {k: v[0] for k, v in parse_qs(url.query).items()})
+
+
+class FrankfurterHandler(_StubHandler):
+    def _rates(self, base, to, day=None):
+        # Historical tables drift a little from day to day so dates can be told apart
+        drift = 1 + (day.toordinal() % 30) / 1000 if day else 1
+        table = dict({c: r * drift for c, r in self.server.rates.items()}, EUR=1.0)
+        if base not in table:
+            return None
+        targets = to.split(",") if to else [c for c in table if c != base]
+        return {t: round(table[t] / table[base], 6) for t in targets if t in table and t != base}
+
+    def handle_get(self, path, query):
+        base = query.get("from", "EUR").upper()
+        to = query.get("to", "").upper()
+        if ".." in path:
+            self._send_range(path[1:], base, to)
+            return
+        if path == "/latest":
+            day = None
+        else:
+            try:
+                day = datetime.date.fromisoformat(path[1:])
+            except ValueError:
+                self._send_json(404, {"message": "not found"})
+                return
+            # Weekends answer with the Friday before, as the ECB doesn't publish then
+            day -= datetime.timedelta(days=max(0, day.weekday() - 4))
+        rates = self._rates(base, to, day)
+        if rates is None:
+            self._send_json(404, {"message": "not found"})
+        else:
+            self._send_json(200, {"amount": 1.0, "base": base, "date": str(day or "2025-01-31"), "rates": rates})
+
+
+    def _send_range(self, span, base, to):
+        first, _, last = span.partition("..")
+        try:
+            first = datetime.date.fromisoformat(first)
+            last = datetime.date.fromisoformat(last) if last else datetime.date.today()
+        except ValueError:
+            self._send_json(404, {"message": "not found"})
+            return
+        rates = {}
+        for n in range(first.toordinal(), last.toordinal() + 1):
+            day = datetime.date.fromordinal(n)
+            if day.weekday() < 5:
+                rates[str(day)] = self._rates(base, to, day)
+        if rates and None in rates.values():
+            self._send_json(404, {"message": "not found"})
+            return
+        self._send_json(200, {"amount": 1.0, "base": base, "start_date": str(first), "end_date": str(last),
+                              "rates": rates})
+
+
+class DictionaryHandler(_StubHandler):
+    PREFIX = "/api/v2/entries/en/"
+
+    def handle_get(self, path, query):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if self.server.fail_every and self.server.hits % self.server.fail_every == 0:
+            retry_after = self.server.retry_after
+            self._send_json(503, {"message": "try again"}, [("Retry-After", str(retry_after))] if retry_after else ())
+            return
+        word = unquote(path[len(self.PREFIX):]) if path.startswith(self.PREFIX) else ""
+        if word not in self.server.words:
+            self._send_json(404, {"title": "No Definitions Found", "message": "Sorry pal, we couldn't find it.",
+                                  "resolution": "Try the search again later."})
+            return
+        self._send_json(200, [{"word": word, "phonetics": [], "meanings": [
+            {"partOfSpeech": "noun", "definitions": [{"definition": f"The first sense of {word}.", "synonyms": []},
+                                                     {"definition": f"Another sense of {word}.", "synonyms": []}]},
+            {"partOfSpeech": "verb", "definitions": [{"definition": f"To {word} something.", "synonyms": []}]},
+        ]}])
+
+
+def _serve(handler, **attrs):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.hits = 0
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    for name, value in attrs.items():
+        setattr(server, name, value)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def serve_frankfurter(rates=None):
+    """Serve /latest, /YYYY-MM-DD and /YYYY-MM-DD..YYYY-MM-DD like api.frankfurter.app.
+
+    Rates come from a fixed EUR table that drifts slightly with the date;
+    weekends have no rates.
+    """
+    return _serve(FrankfurterHandler, rates=dict(rates or FRANKFURTER_RATES))
+
+
+def serve_dictionary(words, latency=0.0, fail_every=0, retry_after=None):
+    """Serve /api/v2/entries/en/<word> like api.dictionaryapi.dev for a fixed set of words.
+
+    latency adds a delay to every response and fail_every answers every
+    n-th request with a 503, carrying a Retry-After of retry_after seconds
+    when given, to exercise concurrency and retries.
+    """
+    server = _serve(DictionaryHandler, words=set(words), latency=latency, fail_every=fail_every,
+                    retry_after=retry_after)
+    server.url = server.url + DictionaryHandler.PREFIX.rstrip("/")
+    return server